@@ -0,0 +1,111 @@
+"""
+Chain construction helpers shared by the agents.
+
+This module memoizes the LangChain chains built by agents so that creating
+several agents (or several teams) on the same LLM instance reuses the prompt
+template and the tool / structured-output bindings instead of rebuilding
+their schemas every time. It also provides the shared default LLM client.
+"""
+
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Hashable
+from langchain_core.caches import InMemoryCache
+from langchain_openai import ChatOpenAI
+from config import DEFAULT_MODEL, LLM_TEMPERATURE, LLM_RESPONSE_CACHE_SIZE, PROMPT_CACHE_KEY_PREFIX
+
+# Maximum number of built chains kept alive
+CHAIN_CACHE_SIZE = 32
+
+_chain_cache: OrderedDict[tuple, tuple[Any, Any]] = OrderedDict()
+_chain_cache_lock = threading.Lock()
+
+
+def cached_chain(llm: Any, key: Hashable, build: Callable[[], Any]) -> Any:
+    """
+    Return the chain for (llm, key), building it on first use.
+
+    Entries are identified by the LLM instance and model name plus a
+    caller-supplied key describing the prompt and bindings. The LLM itself is
+    stored with the chain so its id cannot be recycled by another object while
+    the entry is cached.
+
+    Args:
+        llm: LLM instance the chain is bound to
+        key: Hashable description of the prompt, schema and tools
+        build: Zero-argument callable that builds the chain on a cache miss
+
+    Returns:
+        Cached or newly built LangChain chain
+    """
+    cache_key = (id(llm), getattr(llm, "model_name", None), key)
+
+    with _chain_cache_lock:
+        entry = _chain_cache.get(cache_key)
+        if entry is not None and entry[0] is llm:
+            _chain_cache.move_to_end(cache_key)
+            return entry[1]
+
+    chain = build()
+
+    with _chain_cache_lock:
+        _chain_cache[cache_key] = (llm, chain)
+        _chain_cache.move_to_end(cache_key)
+        while len(_chain_cache) > CHAIN_CACHE_SIZE:
+            _chain_cache.popitem(last=False)
+
+    return chain
+
+
+def clear_chain_cache() -> None:
+    """Drop all memoized chains."""
+    with _chain_cache_lock:
+        _chain_cache.clear()
+
+
+def with_prompt_cache_key(llm: Any, agent_name: str) -> Any:
+    """
+    Route an agent's requests to a shared OpenAI prompt cache.
+    
+    Every request an agent makes starts with the same system prompt and tool
+    schemas, so a per-agent prompt_cache_key keeps those calls on one cache
+    regardless of the user query. Disabled when PROMPT_CACHE_KEY_PREFIX is
+    empty or the LLM is not a ChatOpenAI client.
+    
+    Args:
+        llm: LLM instance the agent's chain is built on
+        agent_name: Name identifying the agent's prompt prefix
+        
+    Returns:
+        Copy of the LLM sending prompt_cache_key, or the LLM unchanged
+    """
+    if not PROMPT_CACHE_KEY_PREFIX or not isinstance(llm, ChatOpenAI):
+        return llm
+    # model_copy shares the underlying HTTP clients with the original instance
+    return llm.model_copy(update={"model_kwargs": {
+        **llm.model_kwargs,
+        "prompt_cache_key": f"{PROMPT_CACHE_KEY_PREFIX}:{agent_name}",
+    }})
+
+
+@lru_cache(maxsize=4)
+def default_llm(model: str = DEFAULT_MODEL, temperature: float = LLM_TEMPERATURE) -> ChatOpenAI:
+    """
+    Return the shared ChatOpenAI client for a model configuration.
+    
+    Agents and teams created without an explicit LLM reuse one client, and
+    with it one HTTP connection pool and one set of chain-cache entries.
+    At temperature 0 the client also answers repeated prompts (same messages,
+    tools and schema) from a bounded in-memory response cache.
+    
+    Args:
+        model: Model name
+        temperature: Sampling temperature
+        
+    Returns:
+        Shared ChatOpenAI instance
+    """
+    if temperature == 0 and LLM_RESPONSE_CACHE_SIZE > 0:
+        return ChatOpenAI(model=model, temperature=temperature, cache=InMemoryCache(maxsize=LLM_RESPONSE_CACHE_SIZE))
+    return ChatOpenAI(model=model, temperature=temperature)
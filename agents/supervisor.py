@@ -7,54 +7,78 @@ each task.
 """
 
 import logging
-from typing import Optional
+import threading
+from collections import OrderedDict
+from typing import Literal, Optional, Sequence
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from pydantic import BaseModel, Field, field_validator
-from core.state import AgentState
-from config import DEFAULT_MODEL, LLM_TEMPERATURE, VALID_AGENTS
+from core.state import AgentState, get_messages
+from config import DEFAULT_MODEL, LLM_TEMPERATURE, VALID_AGENTS, ROUTING_CACHE_SIZE
+from agents.chains import cached_chain, default_llm, with_prompt_cache_key
 
 logger = logging.getLogger(__name__)
 
+# Variations of agent names the LLM may return, mapped to canonical names
+_AGENT_NAME_ALIASES = {
+    "data_analyst": "Data_Analyst",
+    "data analyst": "Data_Analyst",
+    "analyst": "Data_Analyst",
+    "business_strategist": "Business_Strategist",
+    "business strategist": "Business_Strategist",
+    "strategist": "Business_Strategist",
+    "visualizer": "Business_Strategist",  # Legacy support
+    "finish": "FINISH",
+    "end": "FINISH",
+    "done": "FINISH",
+    "complete": "FINISH",
+}
+
+
+def normalize_agent_name(value: str) -> str:
+    """
+    Normalize an agent name returned by the LLM.
+    
+    Args:
+        value: Raw agent name
+        
+    Returns:
+        Canonical agent name, or "FINISH" if it is not a valid agent
+    """
+    value = value.strip()
+    normalized = _AGENT_NAME_ALIASES.get(value.lower(), value)
+    # If still not valid, default to FINISH
+    if normalized not in VALID_AGENTS:
+        return "FINISH"
+    return normalized
+
 
 class RouteResponse(BaseModel):
     """
     Structured output schema for supervisor routing decisions.
     
     This Pydantic model ensures the supervisor always returns a valid
-    routing decision with reasoning.
+    routing decision with reasoning. The Literal type becomes an enum in the
+    JSON schema, so OpenAI strict mode can only generate valid agent names.
     """
-    next: str = Field(
-        description="Next agent to route to. MUST be one of: Data_Analyst, Business_Strategist, or FINISH. NEVER use Visualizer - it has been replaced by Business_Strategist."
+    next: Literal["Data_Analyst", "Business_Strategist", "FINISH"] = Field(
+        description="Next agent to route to: Data_Analyst, Business_Strategist, or FINISH."
     )
     reasoning: str = Field(
         description="Brief explanation for the routing decision"
     )
     
-    @field_validator("next")
+    @field_validator("next", mode="before")
     @classmethod
     def normalize_agent_name(cls, v):
         """Normalize agent names to handle variations."""
-        v = v.strip()
-        mapping = {
-            "data_analyst": "Data_Analyst",
-            "data analyst": "Data_Analyst",
-            "analyst": "Data_Analyst",
-            "business_strategist": "Business_Strategist",
-            "business strategist": "Business_Strategist",
-            "strategist": "Business_Strategist",
-            "visualizer": "Business_Strategist",  # Legacy support
-            "finish": "FINISH",
-            "end": "FINISH",
-            "done": "FINISH",
-            "complete": "FINISH",
-        }
-        normalized = mapping.get(v.lower(), v)
-        # If still not valid, default to FINISH
-        if normalized not in VALID_AGENTS:
-            return "FINISH"
-        return normalized
+        return normalize_agent_name(v)
+
+
+# JSON schema sent to the LLM; the parsed dict is normalized in decide()
+# without running the full Pydantic validation pipeline
+_ROUTE_SCHEMA = RouteResponse.model_json_schema()
 
 
 class SupervisorAgent:
@@ -73,17 +97,28 @@ class SupervisorAgent:
             llm: Optional LLM instance (creates new one if not provided)
         """
         if llm is None:
-            self.llm = ChatOpenAI(
-                model=DEFAULT_MODEL,
-                temperature=LLM_TEMPERATURE
-            )
+            self.llm = default_llm(DEFAULT_MODEL, LLM_TEMPERATURE)
         else:
             self.llm = llm
         
         # Build the supervisor chain with structured output
         self.chain = self._build_chain()
+        
+        # LLM routing decisions for ambiguous turns, memoized by user query (LRU order)
+        self._routing_cache: OrderedDict[str, tuple[str, str]] = OrderedDict()
+        # Supervisors are shared by concurrent requests through the team pool
+        self._routing_cache_lock = threading.Lock()
     
     def _build_chain(self):
+        """
+        Return the supervisor chain, shared by supervisors on the same LLM.
+        
+        Returns:
+            LangChain chain with structured output enabled
+        """
+        return cached_chain(self.llm, ("supervisor", RouteResponse), self._create_chain)
+    
+    def _create_chain(self):
         """
         Build the LangChain chain for the supervisor with structured output.
         
@@ -130,12 +165,99 @@ When in doubt about completion, choose FINISH to avoid infinite loops."""
         ])
         
         # Use structured output to ensure valid routing decisions
-        return prompt | self.llm.with_structured_output(RouteResponse)
+        llm = with_prompt_cache_key(self.llm, "supervisor")
+        return prompt | llm.with_structured_output(_ROUTE_SCHEMA, strict=True)
+    
+    @staticmethod
+    def _fast_route(messages: Sequence) -> Optional[tuple[str, str]]:
+        """
+        Apply the deterministic routing rules without calling the LLM.
+        
+        Scans the conversation once, newest message first:
+        - "STRATEGY:" present => FINISH (strategy task is complete)
+        - "ANALYSIS:" present => Business_Strategist
+        - Only user messages so far => Data_Analyst
+        
+        An error reported after the latest analysis, or worker output without
+        any marker, is ambiguous and left to the LLM.
+        
+        Args:
+            messages: Conversation messages from the workflow state
+            
+        Returns:
+            Tuple of (next_agent, reasoning), or None if the LLM must decide
+        """
+        has_analysis = False
+        has_error = False
+        only_human = True
+        for msg in reversed(messages):
+            content = getattr(msg, "content", "")
+            if not isinstance(content, str):
+                continue
+            if getattr(msg, "type", None) != "human":
+                only_human = False
+            if "STRATEGY:" in content:
+                return "FINISH", "Strategic recommendations already generated. Task is complete."
+            if "ANALYSIS:" in content:
+                has_analysis = True
+            elif not has_analysis and content.startswith("ERROR:"):
+                has_error = True
+        
+        if has_error:
+            return None
+        if has_analysis:
+            return "Business_Strategist", "Data analysis is complete. Routing for strategic recommendations."
+        if only_human:
+            return "Data_Analyst", "No analysis yet. Routing to Data_Analyst to analyze the data."
+        return None
+    
+    @staticmethod
+    def _fingerprint(messages: Sequence) -> Optional[str]:
+        """
+        Build the routing cache key for a conversation _fast_route left to the LLM.
+        
+        The cache is only consulted for that ambiguous case: worker output without
+        an ANALYSIS: or STRATEGY: marker. No marker can be present then, so the key
+        is just the user query, and one LLM decision is reused for every later
+        ambiguous turn of the same query. A decision made after a worker error
+        depends on that error, so such conversations get no key and are never
+        cached.
+        
+        Args:
+            messages: Conversation messages from the workflow state
+            
+        Returns:
+            The latest user query, or None if a worker reported an error
+        """
+        query = ""
+        for msg in reversed(messages):
+            content = getattr(msg, "content", "")
+            if not isinstance(content, str):
+                continue
+            if content.startswith("ERROR:"):
+                return None
+            if not query and getattr(msg, "type", None) == "human":
+                query = content
+        return query
+    
+    def _remember(self, key: str, decision: tuple[str, str]) -> None:
+        """Store a routing decision, evicting the least recently used entry."""
+        with self._routing_cache_lock:
+            self._routing_cache[key] = decision
+            self._routing_cache.move_to_end(key)
+            if len(self._routing_cache) > ROUTING_CACHE_SIZE:
+                self._routing_cache.popitem(last=False)
     
     def decide(self, state: AgentState) -> tuple[str, str]:
         """
         Make a routing decision based on the current state.
         
+        Deterministic cases are resolved by _fast_route without calling the
+        LLM. Ambiguous turns of a query the LLM has already routed (without a
+        worker error) are answered from the routing cache. Teams with
+        deterministic routing (the EnterpriseDataTeam default) route from the
+        completion flags and do not reach this method.
+        
         Args:
             state: Current workflow state
             
@@ -145,27 +267,51 @@ When in doubt about completion, choose FINISH to avoid infinite loops."""
         Raises:
             Exception: If supervisor decision fails
         """
+        messages = get_messages(state)
+        
+        # Rule-based pre-router: skip the LLM when the routing rules are conclusive
+        fast_decision = self._fast_route(messages)
+        if fast_decision is not None:
+            return fast_decision
+        
+        key = self._fingerprint(messages)
+        cached = None
+        if key is not None:
+            with self._routing_cache_lock:
+                cached = self._routing_cache.get(key)
+                if cached is not None:
+                    self._routing_cache.move_to_end(key)
+        if cached is not None:
+            logger.debug("Supervisor routing cache hit: %s", cached[0])
+            return cached
+        
         try:
             decision = self.chain.invoke(state)
+            if isinstance(decision, dict):
+                # Fast path: the only validation needed is the agent-name normalization
+                decision = RouteResponse.model_construct(
+                    next=normalize_agent_name(str(decision.get("next", ""))),
+                    reasoning=str(decision.get("reasoning", ""))
+                )
             
             # Extract next agent and reasoning
             next_agent = decision.next
             reasoning = decision.reasoning
             
-            # CRITICAL: Replace any "Visualizer" references with "Business_Strategist"
-            if next_agent == "Visualizer" or "visualizer" in next_agent.lower():
-                logger.warning(f"Supervisor attempted to route to Visualizer. Replacing with Business_Strategist.")
-                next_agent = "Business_Strategist"
-                reasoning = reasoning.replace("Visualizer", "Business_Strategist").replace("visualizer", "Business_Strategist")
-            
             # Validate the decision
             if next_agent not in VALID_AGENTS:
-                logger.warning(
-                    f"Supervisor returned invalid agent: {next_agent}. "
-                    f"Valid agents: {VALID_AGENTS}"
-                )
-                return "FINISH", f"Invalid routing '{next_agent}' detected. Forcing termination."
+                # Legacy name: the Visualizer's work now belongs to the strategist
+                if next_agent.lower() == "visualizer":
+                    next_agent = "Business_Strategist"
+                else:
+                    logger.warning(
+                        f"Supervisor returned invalid agent: {next_agent}. "
+                        f"Valid agents: {VALID_AGENTS}"
+                    )
+                    return "FINISH", f"Invalid routing '{next_agent}' detected. Forcing termination."
             
+            if key is not None:
+                self._remember(key, (next_agent, reasoning))
             return next_agent, reasoning
             
         except Exception as e:
@@ -5,18 +5,131 @@ This module contains the worker agent classes that perform specific tasks
 like data analysis and strategic recommendations.
 """
 
+import json
 import logging
+import re
+import threading
 import uuid
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import BaseMessage, AIMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import BaseTool
-from core.state import AgentState
-from config import DEFAULT_MODEL, LLM_TEMPERATURE
+from pydantic import BaseModel, Field
+from core.state import AgentState, get_messages
+from config import (
+    DEFAULT_MODEL,
+    LLM_TEMPERATURE,
+    TOOL_CALL_WORKERS,
+    PROMPT_TOKEN_BUDGET,
+    STRATEGY_PREDICTED_OUTPUT,
+)
+from agents.chains import cached_chain, default_llm, with_prompt_cache_key
+
+# Try to import orjson (optional dependency for faster JSON serialization)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Extracts the ANALYSIS: section from a tool result
+_ANALYSIS_RE = re.compile(r'ANALYSIS:\s*(.+?)(?:\s*\||$)', re.DOTALL)
+
+# Keywords selecting the forced Data_Analyst analysis template
+_QUERY_KEYWORD_RE = re.compile(r"\b(margin|profit|revenue|churn|drop|decline)", re.IGNORECASE)
+
+# Analysis kinds in priority order, with the keywords that select them
+_KEYWORD_KINDS = (
+    ("margin", ("margin", "profit")),
+    ("revenue", ("revenue",)),
+    ("churn", ("churn",)),
+    ("decline", ("drop", "decline")),
+)
+
+_CODE_TEMPLATES = {
+    "margin": "# Calculate profit margins\n# Note: This is a demo - replace with actual data analysis\npass",
+    "revenue": "# Analyze revenue trends\n# Note: This is a demo - replace with actual data analysis\npass",
+    "churn": "# Analyze customer churn\n# Note: This is a demo - replace with actual data analysis\npass",
+    "decline": "# Analyze sales decline\n# Note: This is a demo - replace with actual data analysis\npass",
+    "general": "# General data analysis\n# Note: This is a demo - replace with actual data analysis\npass",
+}
+
+
+def _to_content(value) -> str:
+    """
+    Convert a tool result into ToolMessage content.
+    
+    Strings pass through untouched and dicts/lists become compact JSON rather
+    than their Python repr.
+    
+    Args:
+        value: Tool return value
+        
+    Returns:
+        String content for a ToolMessage
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        try:
+            if ORJSON_AVAILABLE:
+                return orjson.dumps(value).decode()
+            return json.dumps(value, separators=(",", ":"))
+        except (TypeError, ValueError):
+            pass
+    return str(value)
+
+
+def _estimate_tokens(content) -> int:
+    """Cheap token estimate (~4 characters per token) used for history budgeting."""
+    return len(content) // 4 + 1 if isinstance(content, str) else 1
+
+
+@lru_cache(maxsize=64)
+def _summarize_contents(entries: tuple[tuple[str, str], ...]) -> str:
+    """
+    Compile older messages into a compact context summary.
+    
+    Keeps the first line of every message, so the user query and the
+    ANALYSIS:/STRATEGY: markers the routing rules rely on survive compaction.
+    
+    Args:
+        entries: Tuple of (message_type, content) pairs, oldest first
+        
+    Returns:
+        Summary text prefixed with "CONTEXT SUMMARY:"
+    """
+    lines = ["CONTEXT SUMMARY: earlier conversation, compacted"]
+    for msg_type, content in entries:
+        first_line = content.strip().split("\n", 1)[0][:200]
+        if first_line:
+            lines.append(f"- {msg_type}: {first_line}")
+    return "\n".join(lines)
+
+
+def _analysis_kind(query: str) -> str:
+    """
+    Classify a query into one of the forced-analysis template kinds.
+    
+    Args:
+        query: User query text
+        
+    Returns:
+        Key into _CODE_TEMPLATES
+    """
+    found = {m.lower() for m in _QUERY_KEYWORD_RE.findall(query)}
+    if found:
+        for kind, keywords in _KEYWORD_KINDS:
+            if not found.isdisjoint(keywords):
+                return kind
+    return "general"
+
 
 class WorkerAgent:
     """
@@ -46,33 +159,179 @@ class WorkerAgent:
         self.name = name
         self.system_prompt = system_prompt
         self.tools = tools
+        self._tools_by_name = {t.name: t for t in tools}
+        self._tool_accepts_user_query = {t.name: self._accepts_user_query(t) for t in tools}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
         
         # Initialize LLM if not provided
         if llm is None:
-            self.llm = ChatOpenAI(
-                model=DEFAULT_MODEL,
-                temperature=LLM_TEMPERATURE
-            )
+            self.llm = default_llm(DEFAULT_MODEL, LLM_TEMPERATURE)
         else:
             self.llm = llm
         
         # Build the agent chain
         self.chain = self._build_chain()
     
+    @staticmethod
+    def _accepts_user_query(tool: BaseTool) -> bool:
+        """
+        Check whether a tool takes a user_query argument.
+        
+        Args:
+            tool: Tool to inspect
+            
+        Returns:
+            True if the tool's argument schema declares user_query
+        """
+        try:
+            return "user_query" in tool.args
+        except Exception:
+            # If schema inspection fails, assume the analysis tool accepts it
+            return tool.name == "execute_python_analysis"
+    
     def _build_chain(self):
         """
         Build the LangChain chain for this worker agent.
         
+        The chain is shared between agents with the same LLM, system prompt
+        and tool set, so the tool schemas are only bound once.
+        
         Returns:
             LangChain chain ready for invocation
         """
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", self.system_prompt),
-            MessagesPlaceholder(variable_name="messages")
-        ])
+        def build():
+            prompt = ChatPromptTemplate.from_messages([
+                ("system", self.system_prompt),
+                MessagesPlaceholder(variable_name="messages")
+            ])
+            
+            # Bind tools to the LLM
+            llm = with_prompt_cache_key(self.llm, self.name)
+            return prompt | llm.bind_tools(self.tools)
+        
+        tools_key = tuple(sorted(t.name for t in self.tools))
+        return cached_chain(self.llm, ("tools", self.system_prompt, tools_key), build)
+    
+    @staticmethod
+    def _compile_messages(messages: list[BaseMessage], max_tokens: int = PROMPT_TOKEN_BUDGET) -> list[BaseMessage]:
+        """
+        Bound the conversation history sent to the LLM.
+        
+        The newest messages are kept while they fit in the token budget; the
+        older ones are compiled into a single "CONTEXT SUMMARY:" message. A
+        kept tail never starts with a ToolMessage, so tool results stay paired
+        with the AIMessage that requested them.
+        
+        Args:
+            messages: Conversation history, oldest first
+            max_tokens: Approximate token budget for the kept messages
+            
+        Returns:
+            The original list if it fits, otherwise summary + recent messages
+        """
+        total = 0
+        split = len(messages)
+        while split > 0:
+            cost = _estimate_tokens(getattr(messages[split - 1], "content", ""))
+            if total + cost > max_tokens and split < len(messages):
+                break
+            total += cost
+            split -= 1
         
-        # Bind tools to the LLM
-        return prompt | self.llm.bind_tools(self.tools)
+        if split == 0:
+            return messages
+        
+        # Don't orphan tool results from their tool-call message
+        while split < len(messages) and getattr(messages[split], "type", None) == "tool":
+            split += 1
+        
+        entries = tuple(
+            (getattr(m, "type", "message"), m.content if isinstance(getattr(m, "content", None), str) else "")
+            for m in messages[:split]
+        )
+        return [AIMessage(content=_summarize_contents(entries))] + list(messages[split:])
+    
+    def _analysis_from_tools(self, tool_messages: list[ToolMessage]) -> Optional[AIMessage]:
+        """
+        Build the Data_Analyst reply directly from successful tool output.
+        
+        The analysis tool already returns "ANALYSIS: <summary> | DATA: <json>",
+        so a second LLM call would only echo it back.
+        
+        Args:
+            tool_messages: ToolMessages produced in this invocation
+            
+        Returns:
+            AIMessage with the "ANALYSIS:" summary, or None if the LLM is needed
+        """
+        if self.name != "Data_Analyst":
+            return None
+        
+        analysis = None
+        for msg in tool_messages:
+            content = msg.content if isinstance(msg.content, str) else ""
+            if content.startswith("ERROR:"):
+                return None
+            if analysis is None and content.startswith("ANALYSIS:"):
+                analysis = _ANALYSIS_RE.search(content)
+        
+        if analysis is None:
+            return None
+        return AIMessage(content=f"ANALYSIS: {analysis.group(1).strip()}")
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the thread pool used for concurrent tool calls, creating it on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=TOOL_CALL_WORKERS,
+                    thread_name_prefix=f"{self.name}-tools"
+                )
+            return self._executor
+    
+    def _execute_tool_call(self, tool_call: dict, user_query: str) -> ToolMessage:
+        """
+        Execute a single tool call requested by the LLM.
+        
+        Args:
+            tool_call: Tool call dict with name, args and id
+            user_query: Original user query, passed to tools that accept it
+            
+        Returns:
+            ToolMessage with the tool result or an ERROR: description
+        """
+        tool_name = tool_call.get("name", "")
+        tool_args = tool_call.get("args", {})
+        tool_id = tool_call.get("id", "")
+        
+        tool = self._tools_by_name.get(tool_name)
+        if not tool:
+            logger.warning(f"Tool {tool_name} not found")
+            return ToolMessage(
+                content=f"ERROR: Tool {tool_name} not available",
+                tool_call_id=tool_id
+            )
+        
+        try:
+            # Add user_query to tool args if tool supports it
+            if self._tool_accepts_user_query.get(tool_name, False):
+                tool_args["user_query"] = user_query
+            
+            # Execute the tool
+            tool_result = tool.invoke(tool_args)
+            
+            # Create tool message response
+            return ToolMessage(
+                content=_to_content(tool_result),
+                tool_call_id=tool_id
+            )
+        except Exception as e:
+            logger.exception(f"Tool {tool_name} execution failed")
+            return ToolMessage(
+                content=f"ERROR: Tool execution failed: {str(e)}",
+                tool_call_id=tool_id
+            )
     
     def invoke(self, state: AgentState) -> list[BaseMessage]:
         """
@@ -94,9 +353,16 @@ class WorkerAgent:
         try:
             # Invoke the agent chain - only pass messages, not the full state
             # The ChatPromptTemplate expects only 'messages' variable
-            # Safe access: handle both dict and TypedDict
-            messages_history = state.get("messages", []) if isinstance(state, dict) else getattr(state, "messages", [])
-            chain_input = {"messages": messages_history}
+            messages_history = get_messages(state)
+            # Compacted history keeps prompt tokens bounded on every chain call
+            prompt_history = self._compile_messages(messages_history)
+            chain_input = {"messages": prompt_history}
+            
+            # Original user query (latest human message), extracted once for all tool calls
+            user_query = next(
+                (getattr(m, "content", "") for m in reversed(messages_history) if getattr(m, "type", None) == "human"),
+                ""
+            )
             
             # For Business_Strategist with structured output, the chain handles it differently
             result = self.chain.invoke(chain_input)
@@ -105,20 +371,12 @@ class WorkerAgent:
             if self.name == "Business_Strategist" and hasattr(self, 'strategy_schema'):
                 # Result is a Pydantic model, convert to AIMessage with STRATEGY: prefix
                 try:
-                    import json
-                    if hasattr(result, 'model_dump'):
-                        # Pydantic v2
-                        json_str = json.dumps(result.model_dump(), indent=2)
-                        content = f"STRATEGY: {json_str}"
-                        result = AIMessage(content=content)
-                    elif hasattr(result, 'dict'):
-                        # Pydantic v1 fallback
-                        json_str = json.dumps(result.dict(), indent=2)
-                        content = f"STRATEGY: {json_str}"
-                        result = AIMessage(content=content)
+                    if isinstance(result, BaseModel):
+                        # Serialize in pydantic-core directly (compact JSON, no intermediate dict)
+                        result = AIMessage(content="STRATEGY: " + result.model_dump_json())
                     else:
                         # Fallback
-                        result = AIMessage(content=f"STRATEGY: {json.dumps(result, default=str, indent=2)}")
+                        result = AIMessage(content=f"STRATEGY: {json.dumps(result, default=str)}")
                 except Exception as e:
                     logger.exception(f"Failed to convert structured output to JSON: {e}")
                     result = AIMessage(content=f"STRATEGY: {str(result)}")
@@ -136,39 +394,17 @@ class WorkerAgent:
             if self.name == "Data_Analyst" and not has_tool_calls:
                 logger.info(f"{self.name} didn't call tool, forcing tool usage")
                 
-                # Data_Analyst must use the tool - extract query and force tool call
-                # Get the original user query or last message
-                query = ""
-                for msg in reversed(state.get("messages", [])):
-                    if hasattr(msg, 'content'):
-                        content = msg.content
-                        # Get the first human message (original query)
-                        if hasattr(msg, 'type') and msg.type == 'human':
-                            query = content
-                            break
-                        # Or use any message that looks like a query
-                        if not query and len(content) < 500:  # Reasonable query length
-                            query = content
-                            break
-                
+                # Data_Analyst must use the tool - force a call for the original user query
+                query = user_query
                 if not query:
                     # Fallback: use the last message content
-                    query = state.get("messages", [])[-1].content if state.get("messages") else "data analysis"
+                    query = messages_history[-1].content if messages_history else "data analysis"
                 
                 # Generate Python code based on query
                 # Use actual pandas/numpy code that the tool can execute
                 code = f"# Analysis for: {query}\n"
                 code += "import pandas as pd\nimport numpy as np\n\n"
-                if "margin" in query.lower() or "profit" in query.lower():
-                    code += "# Calculate profit margins\n# Note: This is a demo - replace with actual data analysis\npass"
-                elif "revenue" in query.lower():
-                    code += "# Analyze revenue trends\n# Note: This is a demo - replace with actual data analysis\npass"
-                elif "churn" in query.lower():
-                    code += "# Analyze customer churn\n# Note: This is a demo - replace with actual data analysis\npass"
-                elif "drop" in query.lower() or "decline" in query.lower():
-                    code += "# Analyze sales decline\n# Note: This is a demo - replace with actual data analysis\npass"
-                else:
-                    code += "# General data analysis\n# Note: This is a demo - replace with actual data analysis\npass"
+                code += _CODE_TEMPLATES[_analysis_kind(query)]
                 
                 # Force tool call - pass user query for context
                 if self.tools:
@@ -192,7 +428,7 @@ class WorkerAgent:
                         
                         # Create ToolMessage that responds to the synthetic AIMessage
                         tool_message = ToolMessage(
-                            content=str(tool_result),
+                            content=_to_content(tool_result),
                             tool_call_id=tool_call_id
                         )
                         
@@ -200,13 +436,13 @@ class WorkerAgent:
                         # The synthetic AIMessage replaces the original result for tool call purposes
                         messages = [synthetic_ai_message, tool_message]
                         
-                        # Now call LLM again to process the tool result
-                        # Only pass messages to the chain
-                        # Safe access: handle both dict and TypedDict
-                        current_messages = state.get("messages", []) if isinstance(state, dict) else getattr(state, "messages", [])
-                        # Include the original result message, then synthetic tool call sequence
-                        updated_messages = current_messages + [result] + messages
-                        final_result = self.chain.invoke({"messages": updated_messages})
+                        # Use the tool's ANALYSIS: output directly when available; otherwise
+                        # call LLM again to process the tool result
+                        final_result = self._analysis_from_tools([tool_message])
+                        if final_result is None:
+                            # Include the original result message, then synthetic tool call sequence
+                            updated_messages = list(prompt_history) + [result] + messages
+                            final_result = self.chain.invoke({"messages": updated_messages})
                         
                         if isinstance(final_result, BaseMessage):
                             messages.append(final_result)
@@ -217,98 +453,48 @@ class WorkerAgent:
             
             # Check if the agent wants to use tools (normal flow)
             if has_tool_calls:
-                # Execute tools and add tool responses
-                tool_messages = []
-                for tool_call in result.tool_calls:
-                    tool_name = tool_call.get("name", "")
-                    tool_args = tool_call.get("args", {})
-                    tool_id = tool_call.get("id", "")
-                    
-                    # Find the tool by name
-                    tool = None
-                    for t in self.tools:
-                        if t.name == tool_name:
-                            tool = t
-                            break
-                    
-                    if tool:
-                        try:
-                            # Execute the tool - add user query context if available
-                            # Extract original user query from state
-                            user_query = ""
-                            for msg in reversed(state.get("messages", [])):
-                                if hasattr(msg, 'type') and msg.type == 'human':
-                                    user_query = msg.content if hasattr(msg, 'content') else ""
-                                    break
-                            
-                            # Add user_query to tool args if tool supports it
-                            try:
-                                schema = tool.args_schema.schema() if hasattr(tool, 'args_schema') else {}
-                                if "properties" in schema and "user_query" in schema["properties"]:
-                                    tool_args["user_query"] = user_query
-                            except Exception:
-                                # If schema check fails, try adding anyway (tool might accept it)
-                                if tool_name == "execute_python_analysis":
-                                    tool_args["user_query"] = user_query
-                            
-                            # Execute the tool
-                            tool_result = tool.invoke(tool_args)
-                            
-                            # Create tool message response
-                            tool_message = ToolMessage(
-                                content=str(tool_result),
-                                tool_call_id=tool_id
-                            )
-                            tool_messages.append(tool_message)
-                        except Exception as e:
-                            logger.exception(f"Tool {tool_name} execution failed")
-                            # Add error tool message
-                            error_message = ToolMessage(
-                                content=f"ERROR: Tool execution failed: {str(e)}",
-                                tool_call_id=tool_id
-                            )
-                            tool_messages.append(error_message)
-                    else:
-                        logger.warning(f"Tool {tool_name} not found")
-                        error_message = ToolMessage(
-                            content=f"ERROR: Tool {tool_name} not available",
-                            tool_call_id=tool_id
-                        )
-                        tool_messages.append(error_message)
+                # Execute tools and add tool responses; independent calls run concurrently
+                tool_calls = result.tool_calls
+                if len(tool_calls) == 1:
+                    tool_messages = [self._execute_tool_call(tool_calls[0], user_query)]
+                else:
+                    tool_messages = list(self._get_executor().map(
+                        lambda call: self._execute_tool_call(call, user_query),
+                        tool_calls
+                    ))
                 
                 # Add tool messages to the list
                 messages.extend(tool_messages)
                 
-                # Now call LLM again with updated messages (including tool results)
-                # to get the final response
-                # Only pass messages to the chain, not the full state
-                # Safe access: handle both dict and TypedDict
-                current_messages = state.get("messages", []) if isinstance(state, dict) else getattr(state, "messages", [])
-                updated_messages = current_messages + messages
-                final_result = self.chain.invoke({"messages": updated_messages})
-                
-                # Ensure final result is a BaseMessage
-                if not isinstance(final_result, BaseMessage):
-                    final_result = AIMessage(content=str(final_result))
-                
-                # Special handling for Data_Analyst: Force preserve "ANALYSIS:" prefix
-                if self.name == "Data_Analyst" and hasattr(final_result, 'content'):
-                    # Check if tool result contains "ANALYSIS:" but final response doesn't
-                    tool_result_content = ""
-                    for msg in tool_messages:
-                        if hasattr(msg, 'content') and "ANALYSIS:" in msg.content:
-                            tool_result_content = msg.content
-                            break
+                # Data_Analyst tool output already carries the answer; skip the echo round-trip
+                final_result = self._analysis_from_tools(tool_messages)
+                if final_result is None:
+                    # Now call LLM again with updated messages (including tool results)
+                    # to get the final response
+                    # Only pass messages to the chain, not the full state
+                    updated_messages = list(prompt_history) + messages
+                    final_result = self.chain.invoke({"messages": updated_messages})
+                    
+                    # Ensure final result is a BaseMessage
+                    if not isinstance(final_result, BaseMessage):
+                        final_result = AIMessage(content=str(final_result))
+                    
+                    # Special handling for Data_Analyst: Force preserve "ANALYSIS:" prefix
+                    if self.name == "Data_Analyst" and hasattr(final_result, 'content'):
+                        # Check if tool result contains "ANALYSIS:" but final response doesn't
+                        tool_result_content = next(
+                            (m.content for m in tool_messages if "ANALYSIS:" in getattr(m, "content", "")),
+                            ""
+                        )
                     
-                    if tool_result_content and "ANALYSIS:" not in final_result.content:
-                        # Extract the ANALYSIS part from tool result
-                        import re
-                        analysis_match = re.search(r'ANALYSIS:\s*(.+?)(?:\s*\||$)', tool_result_content, re.DOTALL)
-                        if analysis_match:
-                            # Replace final response with ANALYSIS: prefix preserved
-                            analysis_text = analysis_match.group(1).strip()
-                            final_result.content = f"ANALYSIS: {analysis_text}"
-                            logger.info("Data_Analyst: Forced preservation of ANALYSIS: prefix")
+                        if tool_result_content and "ANALYSIS:" not in final_result.content:
+                            # Extract the ANALYSIS part from tool result
+                            analysis_match = _ANALYSIS_RE.search(tool_result_content)
+                            if analysis_match:
+                                # Replace final response with ANALYSIS: prefix preserved
+                                analysis_text = analysis_match.group(1).strip()
+                                final_result.content = f"ANALYSIS: {analysis_text}"
+                                logger.info("Data_Analyst: Forced preservation of ANALYSIS: prefix")
                 
                 # Add final response (but don't add if it has more tool calls to avoid loops)
                 if not (hasattr(final_result, 'tool_calls') and final_result.tool_calls):
@@ -377,6 +563,27 @@ ALWAYS preserve the "ANALYSIS:" prefix from the tool output in your final respon
         )
 
 
+class StrategyAction(BaseModel):
+    """A single prioritized strategic recommendation."""
+    action: str = Field(description="Specific, actionable business recommendation")
+    rating: int = Field(description="Priority rating from 1-10, where 10 is highest priority/impact", ge=1, le=10)
+    rationale: str = Field(description="Explanation of why this action is important based on the data analysis")
+
+
+class BusinessStrategyResponse(BaseModel):
+    """Structured output schema for the Business Strategist."""
+    actions: List[StrategyAction] = Field(description="Exactly 3 strategic actions, prioritized by rating (highest first)")
+    summary: str = Field(description="Overall strategic insight based on the analysis")
+
+
+# Fixed JSON skeleton of BusinessStrategyResponse, used as a Predicted Output draft
+_STRATEGY_PREDICTION = (
+    '{"actions":['
+    + ",".join(['{"action":"","rating":0,"rationale":""}'] * 3)
+    + '],"summary":""}'
+)
+
+
 class BusinessStrategistAgent(WorkerAgent):
     """
     Business Strategist worker agent.
@@ -385,30 +592,7 @@ class BusinessStrategistAgent(WorkerAgent):
     recommendations with actionable business advice.
     """
     
-    def __init__(self, llm: Optional[ChatOpenAI] = None):
-        """
-        Initialize the Business Strategist agent.
-        
-        Args:
-            llm: Optional LLM instance (creates new one if not provided)
-        """
-        from pydantic import BaseModel, Field
-        from typing import List
-        
-        # Define structured output schema
-        class StrategyAction(BaseModel):
-            action: str = Field(description="Specific, actionable business recommendation")
-            rating: int = Field(description="Priority rating from 1-10, where 10 is highest priority/impact", ge=1, le=10)
-            rationale: str = Field(description="Explanation of why this action is important based on the data analysis")
-        
-        class BusinessStrategyResponse(BaseModel):
-            actions: List[StrategyAction] = Field(description="Exactly 3 strategic actions, prioritized by rating (highest first)")
-            summary: str = Field(description="Overall strategic insight based on the analysis")
-        
-        # Store schema for use in invoke
-        self.strategy_schema = BusinessStrategyResponse
-        
-        system_prompt = """You are a Senior Business Strategist with expertise in data-driven decision making,
+    SYSTEM_PROMPT = """You are a Senior Business Strategist with expertise in data-driven decision making,
 strategic planning, and actionable business recommendations.
 
 Your role is to analyze data insights from the Data_Analyst and provide strategic recommendations.
@@ -440,10 +624,27 @@ Example:
 - You provide 3 actions focused on capitalizing on the 21.7% growth, with ratings 9, 7, 6
 
 Always provide exactly 3 actions with ratings. Be strategic, specific, and data-driven."""
+    
+    # Escape braces so LangChain does not treat them as template variables;
+    # the template is compiled once at import time and shared by all instances
+    _PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT.translate(str.maketrans({"{": "{{", "}": "}}"}))),
+        MessagesPlaceholder(variable_name="messages")
+    ])
+    
+    def __init__(self, llm: Optional[ChatOpenAI] = None):
+        """
+        Initialize the Business Strategist agent.
+        
+        Args:
+            llm: Optional LLM instance (creates new one if not provided)
+        """
+        # Store schema for use in invoke
+        self.strategy_schema = BusinessStrategyResponse
         
         super().__init__(
             name="Business_Strategist",
-            system_prompt=system_prompt,
+            system_prompt=self.SYSTEM_PROMPT,
             tools=[],  # No tools needed - this agent provides strategic recommendations
             llm=llm
         )
@@ -453,17 +654,18 @@ Always provide exactly 3 actions with ratings. Be strategic, specific, and data-
     
     def _build_chain_with_structured_output(self):
         """Build chain with structured output to ensure valid JSON."""
-        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-        
-        # Escape any braces in the system prompt to prevent template parsing errors
-        # LangChain will interpret { } as template variables, so we escape them
-        escaped_prompt = self.system_prompt.replace('{', '{{').replace('}', '}}')
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", escaped_prompt),
-            MessagesPlaceholder(variable_name="messages")
-        ])
+        def build():
+            llm = with_prompt_cache_key(self.llm, self.name)
+            if STRATEGY_PREDICTED_OUTPUT and isinstance(llm, ChatOpenAI):
+                # Most output tokens are the schema's fixed keys; let the API accept them as drafts
+                llm = llm.model_copy(update={"model_kwargs": {
+                    **llm.model_kwargs,
+                    "prediction": {"type": "content", "content": _STRATEGY_PREDICTION},
+                }})
+            
+            # Use structured output to force valid JSON
+            return self._PROMPT_TEMPLATE | llm.with_structured_output(self.strategy_schema)
         
-        # Use structured output to force valid JSON
-        return prompt | self.llm.with_structured_output(self.strategy_schema)
+        key = ("structured", self.system_prompt, self.strategy_schema)
+        return cached_chain(self.llm, key, build)
 
@@ -5,22 +5,51 @@ This module defines the REST API endpoints for interacting with the
 multi-agent data analysis system.
 """
 
+import hashlib
 import json
 import logging
+import mimetypes
 import asyncio
+import threading
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
-from typing import Generator
+from email.utils import formatdate
+from functools import lru_cache
+from pathlib import Path
+from typing import AsyncGenerator, Callable, Iterator, Optional
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse, FileResponse, HTMLResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, FileResponse, HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel, Field
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+from langchain_core.messages import BaseMessage
 import os
 
 from workflow import EnterpriseDataTeam
-from config import CORS_ORIGINS, MESSAGE_WINDOW, MAX_ITERATIONS_DEFAULT
+from config import CORS_ORIGINS, CORS_METHODS, CORS_HEADERS, MESSAGE_WINDOW, MAX_ITERATIONS_DEFAULT
 from utils.query_validator import is_query_absurd, is_query_too_ambiguous
+from utils.timestamps import utc_now_iso, utc_now_iso_seconds
+
+# Try to import orjson (optional dependency for faster event serialization)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+# Try to import msgspec (optional dependency; its pre-built encoder is preferred over orjson)
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+    msgspec = None
 
 logger = logging.getLogger(__name__)
 
@@ -31,16 +60,42 @@ app = FastAPI(
     version="1.0.0",
 )
 
-# Configure CORS
+# Configure CORS with explicit origins, methods and headers so preflight
+# responses are constant; credentials are never combined with a wildcard origin
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=CORS_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=sorted(CORS_ORIGINS),
+    allow_credentials="*" not in CORS_ORIGINS,
+    allow_methods=list(CORS_METHODS),
+    allow_headers=list(CORS_HEADERS),
 )
 
 
+class _UncompressedStreamGZipMiddleware:
+    """
+    GZip middleware that leaves the /run event stream uncompressed.
+    
+    Streamed NDJSON events must reach the client as they are produced, not wait
+    in the compressor's buffer. GZipMiddleware only gained exclude_content_types
+    in recent Starlette releases, so the stream is bypassed by path instead.
+    """
+    
+    def __init__(self, app: ASGIApp, minimum_size: int = 500) -> None:
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"] == "/run":
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
+
+
+# Compress HTML/JSON/static responses over 1 KB; the NDJSON event stream is
+# left out so events are never held back in the compressor's buffer
+app.add_middleware(_UncompressedStreamGZipMiddleware, minimum_size=1024)
+
+
 # ============================================================================
 # REQUEST/RESPONSE MODELS
 # ============================================================================
@@ -65,6 +120,12 @@ class QueryRequest(BaseModel):
         ge=1,
         le=50
     )
+    thread_id: Optional[str] = Field(
+        default=None,
+        description="Thread of an interrupted run to resume (only used when checkpointing is enabled)",
+        min_length=1,
+        max_length=64
+    )
 
 
 class HealthResponse(BaseModel):
@@ -74,6 +135,164 @@ class HealthResponse(BaseModel):
     version: str
 
 
+# ============================================================================
+# EVENT SERIALIZATION
+# ============================================================================
+
+def _json_default(obj):
+    """Convert values JSON cannot encode natively (messages, datetimes, others)."""
+    if isinstance(obj, BaseMessage):
+        return obj.content
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)
+
+
+# Built once and reused for every event when msgspec is installed
+_MSGSPEC_ENCODER = msgspec.json.Encoder(enc_hook=_json_default) if MSGSPEC_AVAILABLE else None
+
+
+def _encode_event(event: dict) -> bytes:
+    """
+    Encode a workflow event as one NDJSON line.
+    
+    Uses msgspec if available, then orjson, then the standard library.
+    
+    Args:
+        event: Event dictionary
+        
+    Returns:
+        UTF-8 JSON bytes terminated by a newline
+    """
+    if MSGSPEC_AVAILABLE:
+        return _MSGSPEC_ENCODER.encode(event) + b"\n"
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(event, default=_json_default, option=orjson.OPT_APPEND_NEWLINE)
+    # Compact and unescaped like orjson, so every encoder writes the same line
+    return (json.dumps(event, default=_json_default, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+
+
+# ============================================================================
+# STREAMING
+# ============================================================================
+
+# Maximum number of events buffered between the workflow thread and the response
+_STREAM_QUEUE_SIZE = 16
+
+# Marks the end of a threaded stream
+_STREAM_END = object()
+
+# Encoded events are coalesced into writes of at most about this many bytes
+_STREAM_FLUSH_BYTES = 16 * 1024
+
+
+class _StreamFailure:
+    """Carries an exception raised by the producer thread to the consumer."""
+    
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def _iterate_batches_in_thread(
+    make_iterator: Callable[[], Iterator],
+    maxsize: int = _STREAM_QUEUE_SIZE
+) -> AsyncGenerator[list, None]:
+    """
+    Drive a blocking iterator in a worker thread and yield its items in batches.
+    
+    The iterator runs in a dedicated daemon thread and hands items over through
+    a bounded asyncio.Queue, so LLM calls never block the event loop and a slow
+    client applies backpressure to the workflow. Each batch holds every item
+    already queued when the consumer wakes up, so bursts are handed over
+    together without waiting for more. If the consumer stops early (e.g. client
+    disconnect), the producer stops after its current item.
+    
+    Args:
+        make_iterator: Zero-argument callable returning the blocking iterator
+        maxsize: Queue capacity (and therefore the largest batch)
+        
+    Yields:
+        Non-empty lists of items produced by the iterator, in order
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    
+    def put(item) -> bool:
+        try:
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        except RuntimeError:
+            # Event loop already closed
+            return False
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return True
+            except FutureTimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    return False
+            except Exception:
+                # Put was cancelled because the consumer went away
+                return False
+    
+    def produce() -> None:
+        try:
+            for item in make_iterator():
+                if stop.is_set() or not put(item):
+                    return
+            put(_STREAM_END)
+        except BaseException as e:
+            put(_StreamFailure(e))
+    
+    threading.Thread(target=produce, name="workflow-stream", daemon=True).start()
+    
+    try:
+        done = None
+        while done is None:
+            batch = []
+            item = await queue.get()
+            while True:
+                if item is _STREAM_END or isinstance(item, _StreamFailure):
+                    done = item
+                    break
+                batch.append(item)
+                if queue.empty():
+                    break
+                item = queue.get_nowait()
+            if batch:
+                yield batch
+        if isinstance(done, _StreamFailure):
+            raise done.error
+    finally:
+        stop.set()
+
+
+# ============================================================================
+# TEAM POOL
+# ============================================================================
+
+@lru_cache(maxsize=16)
+def _get_team(max_iterations: int, message_window: int) -> EnterpriseDataTeam:
+    """
+    Return a shared agent team for the given workflow parameters.
+    
+    Teams hold only the LLM client, agents and the compiled graph; per-query
+    state lives inside run_stream, so one team can serve concurrent requests.
+    
+    Args:
+        max_iterations: Maximum number of workflow iterations
+        message_window: Number of messages to keep in conversation history
+        
+    Returns:
+        EnterpriseDataTeam instance
+    """
+    return EnterpriseDataTeam(
+        max_iterations=max_iterations,
+        message_window=message_window
+    )
+
+
 # ============================================================================
 # API ROUTES
 # ============================================================================
@@ -88,7 +307,7 @@ async def health_check():
     """
     return HealthResponse(
         status="healthy",
-        timestamp=datetime.utcnow().isoformat(),
+        timestamp=utc_now_iso_seconds(),
         version="1.0.0"
     )
 
@@ -106,7 +325,9 @@ async def run_workflow(request: QueryRequest):
         request: QueryRequest containing the user query and optional parameters
         
     Returns:
-        StreamingResponse with NDJSON events
+        StreamingResponse with NDJSON events; with checkpointing enabled, the
+        X-Thread-Id header names the run's thread, which can be sent back as
+        thread_id to resume the run if it is interrupted
         
     Example:
         POST /run
@@ -132,45 +353,60 @@ async def run_workflow(request: QueryRequest):
             logger.info(f"Ambiguous query detected: {request.query}. Suggestion: {ambiguity_suggestion}")
             # Don't reject, but log for monitoring
         
-        # Initialize the agent team with custom parameters
-        agent_team = EnterpriseDataTeam(
-            max_iterations=request.max_iterations,
-            message_window=request.message_window
-        )
+        # Reuse a pooled agent team for these parameters
+        agent_team = _get_team(request.max_iterations, request.message_window)
+        
+        # Checkpointed runs get a thread id the client can send back to resume them
+        thread_id = None
+        response_headers = {
+            "X-Accel-Buffering": "no",  # Disable nginx buffering
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+        if agent_team.checkpointer is not None:
+            thread_id = request.thread_id or uuid.uuid4().hex
+            response_headers["X-Thread-Id"] = thread_id
         
         # Create async generator for streaming
-        # This wraps the synchronous workflow stream into an async generator
-        # that can be consumed by FastAPI's StreamingResponse
-        async def event_generator() -> Generator[str, None, None]:
+        # The synchronous workflow stream runs in a worker thread and is bridged
+        # into an async generator that can be consumed by FastAPI's StreamingResponse.
+        # No explicit yielding or sleeping is needed: each chunk's send() only
+        # blocks while the server's socket write buffer is above its high-water
+        # mark, and the bounded queue carries that backpressure to the workflow
+        # thread, so a fast client is never throttled and a slow one pauses work.
+        async def event_generator() -> AsyncGenerator[bytes, None]:
             """
             Async generator that wraps the synchronous workflow stream.
             
             Converts synchronous workflow events into async NDJSON stream
-            for real-time client updates.
+            for real-time client updates. Events that are ready together are
+            written in one chunk instead of one send per event.
             
             Yields:
-                JSON-encoded event strings (NDJSON format - newline-delimited JSON)
+                JSON-encoded event lines (NDJSON format - newline-delimited JSON)
             """
             try:
                 # Stream workflow events from the multi-agent team
                 # Each event represents a step in the workflow (decision, action, etc.)
-                for event in agent_team.run_stream(request.query):
-                    # Small delay for better UX (prevents overwhelming the client)
-                    # Also allows for smoother streaming experience
-                    await asyncio.sleep(0.1)
-                    
-                    # Serialize event to JSON
-                    try:
-                        event_json = json.dumps(event, default=str)
-                        yield event_json + "\n"
-                    except Exception as e:
-                        logger.exception("Event serialization failed")
-                        error_event = {
-                            "type": "error",
-                            "time": datetime.utcnow().isoformat(),
-                            "error": f"Event serialization failed: {str(e)}"
-                        }
-                        yield json.dumps(error_event) + "\n"
+                async for events in _iterate_batches_in_thread(lambda: agent_team.run_stream(request.query, thread_id)):
+                    buffer = bytearray()
+                    for event in events:
+                        # Serialize event to JSON
+                        try:
+                            buffer += _encode_event(event)
+                        except Exception as e:
+                            logger.exception("Event serialization failed")
+                            error_event = {
+                                "type": "error",
+                                "time": utc_now_iso(),
+                                "error": f"Event serialization failed: {str(e)}"
+                            }
+                            buffer += _encode_event(error_event)
+                        if len(buffer) >= _STREAM_FLUSH_BYTES:
+                            yield bytes(buffer)
+                            buffer.clear()
+                    if buffer:
+                        yield bytes(buffer)
                         
             except asyncio.CancelledError:
                 logger.info("Client disconnected during streaming")
@@ -179,20 +415,16 @@ async def run_workflow(request: QueryRequest):
                 logger.exception("Streaming generator failed")
                 error_event = {
                     "type": "error",
-                    "time": datetime.utcnow().isoformat(),
+                    "time": utc_now_iso(),
                     "error": f"Server streaming error: {str(e)}"
                 }
-                yield json.dumps(error_event) + "\n"
+                yield _encode_event(error_event)
         
         # Return streaming response
         return StreamingResponse(
             event_generator(),
             media_type="application/x-ndjson",
-            headers={
-                "X-Accel-Buffering": "no",  # Disable nginx buffering
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-            }
+            headers=response_headers
         )
         
     except Exception as e:
@@ -205,71 +437,155 @@ async def run_workflow(request: QueryRequest):
 
 # Mount static files for the web interface
 # Get the project root directory (parent of api directory)
-_api_file_path = os.path.abspath(__file__)
-_api_dir = os.path.dirname(_api_file_path)
-_project_root = os.path.dirname(_api_dir)
-static_dir = os.path.join(_project_root, "static")
+_project_root = Path(__file__).resolve().parent.parent
+
+# Resolved once at import; routes only use the cached responses built below
+STATIC_DIR = _project_root / "static"
+
+
+# Static assets larger than this are served from disk instead of memory
+STATIC_CACHE_MAX_BYTES = 1024 * 1024
 
-# Normalize the path to handle any path issues
-static_dir = os.path.normpath(static_dir)
 
-# Store static_dir for use in routes
-STATIC_DIR = static_dir
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles variant that serves the interface assets from memory.
+    
+    Files in the directory are read once at startup, so CSS and JS requests
+    skip the per-request stat() and threaded file read. Conditional requests
+    are answered with a 304. Files that are not cached (too large, or added
+    after startup) fall back to regular StaticFiles handling.
+    """
+    
+    def __init__(self, *, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self._cache: dict[str, tuple[bytes, dict[str, str]]] = {}
+        
+        for dir_path, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                full_path = os.path.join(dir_path, file_name)
+                try:
+                    if os.path.getsize(full_path) > STATIC_CACHE_MAX_BYTES:
+                        continue
+                    with open(full_path, 'rb') as f:
+                        content = f.read()
+                    mtime = os.path.getmtime(full_path)
+                except OSError as e:
+                    logger.warning(f"Could not cache static file {full_path}: {e}")
+                    continue
+                
+                media_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+                if media_type.startswith("text/"):
+                    media_type += "; charset=utf-8"
+                self._cache[os.path.relpath(full_path, directory)] = (content, {
+                    "Content-Type": media_type,
+                    "Cache-Control": "public, max-age=60",
+                    "ETag": f'"{hashlib.md5(content).hexdigest()}"',
+                    "Last-Modified": formatdate(mtime, usegmt=True),
+                })
+    
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        """
+        Return the cached asset for path, or defer to StaticFiles.
+        
+        Args:
+            path: Normalized path relative to the static directory
+            scope: ASGI request scope
+            
+        Returns:
+            The asset response, or a 304 if the client copy is current
+        """
+        cached = self._cache.get(path)
+        if cached is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+        
+        content, headers = cached
+        if self.is_not_modified(Headers(headers=headers), Headers(scope=scope)):
+            return Response(status_code=304, headers={"ETag": headers["ETag"]})
+        return Response(content=content, headers=headers)
+
 
 # Mount static files if directory exists
-if os.path.exists(static_dir):
-    # Mount CSS and JS files
-    app.mount("/static", StaticFiles(directory=static_dir), name="static")
-    logger.info(f"Static files mounted from: {static_dir}")
+if STATIC_DIR.is_dir():
+    # Mount CSS and JS files (held in memory after startup)
+    app.mount("/static", CachedStaticFiles(directory=str(STATIC_DIR)), name="static")
+    logger.info(f"Static files mounted from: {STATIC_DIR}")
 else:
-    logger.warning(f"Static directory not found at: {static_dir}")
+    logger.warning(f"Static directory not found at: {STATIC_DIR}")
+
+
+# Read the web interface once at startup and serve it from memory
+INDEX_PATH = STATIC_DIR / "index.html"
+_INDEX_RESPONSE: Optional[Response] = None
+_INDEX_ETAG: Optional[str] = None
+_INDEX_ERROR: Optional[str] = None
+
+# Error page served when the interface is missing; all values are known at startup
+_MISSING_INDEX_HTML = f"""
+<!DOCTYPE html>
+<html>
+<head><title>Interface Not Found</title></head>
+<body>
+    <h1>Web Interface Not Found</h1>
+    <p>Expected path: {INDEX_PATH}</p>
+    <p>Static directory: {STATIC_DIR}</p>
+    <p>Please ensure static/index.html exists.</p>
+</body>
+</html>
+"""
+
+if INDEX_PATH.is_file():
+    try:
+        _index_bytes = INDEX_PATH.read_bytes()
+        _INDEX_ETAG = f'"{hashlib.md5(_index_bytes).hexdigest()}"'
+        _INDEX_RESPONSE = Response(
+            content=_index_bytes,
+            media_type="text/html",
+            headers={
+                "Cache-Control": "public, max-age=60",
+                "ETag": _INDEX_ETAG,
+                "Last-Modified": formatdate(INDEX_PATH.stat().st_mtime, usegmt=True),
+            }
+        )
+        logger.info(f"Loaded index.html ({len(_index_bytes)} bytes)")
+    except Exception as e:
+        _INDEX_ERROR = str(e)
+        logger.error(f"Error reading index.html: {e}")
+else:
+    logger.error(f"index.html not found at: {INDEX_PATH}")
+    logger.error(f"Static directory: {STATIC_DIR}")
+    logger.error(f"Project root: {_project_root}")
+
+# Pre-built response for when the interface is unavailable
+if _INDEX_ERROR is not None:
+    _FALLBACK_RESPONSE = HTMLResponse(
+        content=f"<h1>Error loading interface</h1><p>{_INDEX_ERROR}</p>",
+        status_code=500
+    )
+else:
+    _FALLBACK_RESPONSE = HTMLResponse(content=_MISSING_INDEX_HTML, status_code=404)
 
 
 @app.get("/", response_class=HTMLResponse)
-async def root():
+async def root(request: Request):
     """
     Root endpoint - serves the web interface.
     
+    The page is cached in memory at startup; clients revalidating with a
+    matching If-None-Match header get a 304 without a body.
+    
+    Args:
+        request: Incoming request (used for conditional GET)
+    
     Returns:
         HTML file for the web interface
     """
-    index_path = os.path.join(STATIC_DIR, "index.html")
+    logger.debug("Root endpoint called")
     
-    # Debug logging
-    logger.info(f"Root endpoint called")
-    logger.info(f"Looking for index.html at: {index_path}")
-    logger.info(f"File exists: {os.path.exists(index_path)}")
+    if _INDEX_RESPONSE is not None:
+        if request.headers.get("if-none-match") == _INDEX_ETAG:
+            return Response(status_code=304, headers={"ETag": _INDEX_ETAG})
+        return _INDEX_RESPONSE
     
-    if os.path.exists(index_path):
-        try:
-            # Read the HTML file and return it
-            with open(index_path, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-            logger.info(f"Successfully loaded index.html ({len(html_content)} bytes)")
-            return HTMLResponse(content=html_content)
-        except Exception as e:
-            logger.error(f"Error reading index.html: {e}")
-            return HTMLResponse(
-                content=f"<h1>Error loading interface</h1><p>{str(e)}</p>",
-                status_code=500
-            )
-    else:
-        # Fallback to API info if static files not found
-        logger.error(f"index.html not found at: {index_path}")
-        logger.error(f"Static directory: {STATIC_DIR}")
-        logger.error(f"Project root: {_project_root}")
-        # Return HTML with error message
-        error_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head><title>Interface Not Found</title></head>
-        <body>
-            <h1>Web Interface Not Found</h1>
-            <p>Expected path: {index_path}</p>
-            <p>Static directory: {STATIC_DIR}</p>
-            <p>Please ensure static/index.html exists.</p>
-        </body>
-        </html>
-        """
-        return HTMLResponse(content=error_html, status_code=404)
-
+    # Error page if the interface could not be loaded (reported once at startup)
+    return _FALLBACK_RESPONSE
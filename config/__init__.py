@@ -6,11 +6,22 @@ from config.settings import (
     MAX_ITERATIONS_DEFAULT,
     MESSAGE_WINDOW,
     VALID_AGENTS,
+    ROUTING_CACHE_SIZE,
+    LLM_RESPONSE_CACHE_SIZE,
+    TOOL_CALL_WORKERS,
+    CHECKPOINT_DB_PATH,
     DEFAULT_MODEL,
     LLM_TEMPERATURE,
+    PROMPT_TOKEN_BUDGET,
+    STRATEGY_PREDICTED_OUTPUT,
+    PROMPT_CACHE_KEY_PREFIX,
     API_HOST,
     API_PORT,
+    API_WORKERS,
+    API_KEEPALIVE_TIMEOUT,
     CORS_ORIGINS,
+    CORS_METHODS,
+    CORS_HEADERS,
     FORBIDDEN_MODULES,
     LOG_LEVEL,
     OPENAI_API_KEY,
@@ -23,11 +34,22 @@ __all__ = [
     "MAX_ITERATIONS_DEFAULT",
     "MESSAGE_WINDOW",
     "VALID_AGENTS",
+    "ROUTING_CACHE_SIZE",
+    "LLM_RESPONSE_CACHE_SIZE",
+    "TOOL_CALL_WORKERS",
+    "CHECKPOINT_DB_PATH",
     "DEFAULT_MODEL",
     "LLM_TEMPERATURE",
+    "PROMPT_TOKEN_BUDGET",
+    "STRATEGY_PREDICTED_OUTPUT",
+    "PROMPT_CACHE_KEY_PREFIX",
     "API_HOST",
     "API_PORT",
+    "API_WORKERS",
+    "API_KEEPALIVE_TIMEOUT",
     "CORS_ORIGINS",
+    "CORS_METHODS",
+    "CORS_HEADERS",
     "FORBIDDEN_MODULES",
     "LOG_LEVEL",
     "OPENAI_API_KEY",
@@ -30,7 +30,21 @@ MAX_ITERATIONS_DEFAULT: Final[int] = 10
 MESSAGE_WINDOW: Final[int] = 8
 
 # Valid agent names that can be routed by the supervisor
-VALID_AGENTS: Final[set[str]] = {"Data_Analyst", "Business_Strategist", "FINISH"}
+VALID_AGENTS: Final[frozenset[str]] = frozenset({"Data_Analyst", "Business_Strategist", "FINISH"})
+
+# Number of supervisor routing decisions memoized per SupervisorAgent instance
+ROUTING_CACHE_SIZE: Final[int] = 128
+
+# Number of LLM responses kept in the exact-match cache of the shared default client
+# (keyed on the full prompt and bindings; only used at temperature 0, 0 disables)
+LLM_RESPONSE_CACHE_SIZE: Final[int] = int(os.getenv("LLM_RESPONSE_CACHE_SIZE", "256"))
+
+# Maximum number of tool calls a worker agent executes concurrently
+TOOL_CALL_WORKERS: Final[int] = 4
+
+# SQLite file the workflow checkpoints each step to, so a rerun of an interrupted query
+# resumes after its last completed node (needs langgraph-checkpoint-sqlite; empty disables)
+CHECKPOINT_DB_PATH: Final[str] = os.getenv("CHECKPOINT_DB_PATH", "")
 
 # ============================================================================
 # LLM CONFIGURATION
@@ -42,6 +56,19 @@ DEFAULT_MODEL: Final[str] = "gpt-4o"
 # Temperature setting for LLM (0 = deterministic, higher = more creative)
 LLM_TEMPERATURE: Final[float] = 0.0
 
+# Approximate prompt-token budget for conversation history sent to worker agents;
+# older messages beyond it are compiled into a single context summary
+PROMPT_TOKEN_BUDGET: Final[int] = 4000
+
+# Send the Business Strategist's JSON skeleton as an OpenAI Predicted Output so
+# the fixed keys are accepted as draft tokens (opt-in; rejected draft tokens are billed)
+STRATEGY_PREDICTED_OUTPUT: Final[bool] = os.getenv("STRATEGY_PREDICTED_OUTPUT", "false").lower() == "true"
+
+# Prefix of the OpenAI prompt_cache_key sent with each agent's requests ("<prefix>:<agent>"),
+# so calls sharing an agent's system prompt and tool schemas land on the same prompt cache.
+# Empty disables the parameter (e.g. for OpenAI-compatible endpoints that reject it)
+PROMPT_CACHE_KEY_PREFIX: Final[str] = os.getenv("PROMPT_CACHE_KEY_PREFIX", "")
+
 # ============================================================================
 # API CONFIGURATION
 # ============================================================================
@@ -53,15 +80,32 @@ API_HOST: Final[str] = os.getenv("API_HOST", "127.0.0.1")
 # API server port
 API_PORT: Final[int] = int(os.getenv("API_PORT", "8000"))
 
-# CORS allowed origins (use "*" for development, restrict in production)
-CORS_ORIGINS: Final[list[str]] = ["*"]
+# Number of uvicorn worker processes (each holds its own agent team pool)
+API_WORKERS: Final[int] = int(os.getenv("API_WORKERS", "1"))
+
+# Seconds an idle client connection is kept open for reuse
+API_KEEPALIVE_TIMEOUT: Final[int] = int(os.getenv("API_KEEPALIVE_TIMEOUT", "30"))
+
+# CORS allowed origins, comma-separated in the CORS_ORIGINS environment variable
+# (defaults to the local interface; use "*" only for development)
+CORS_ORIGINS: Final[frozenset[str]] = frozenset(
+    origin.strip()
+    for origin in os.getenv(
+        "CORS_ORIGINS", f"http://localhost:{API_PORT},http://127.0.0.1:{API_PORT}"
+    ).split(",")
+    if origin.strip()
+)
+
+# HTTP methods and request headers the API actually accepts cross-origin
+CORS_METHODS: Final[tuple[str, ...]] = ("GET", "POST")
+CORS_HEADERS: Final[tuple[str, ...]] = ("Content-Type", "Authorization")
 
 # ============================================================================
 # SECURITY CONFIGURATION
 # ============================================================================
 
 # Forbidden module names that cannot be imported in user code
-FORBIDDEN_MODULES: Final[set[str]] = {
+FORBIDDEN_MODULES: Final[frozenset[str]] = frozenset({
     "os",
     "sys",
     "subprocess",
@@ -71,7 +115,7 @@ FORBIDDEN_MODULES: Final[set[str]] = {
     "exec",
     "compile",
     "open"
-}
+})
 
 # ============================================================================
 # API KEYS (SECURE - FROM ENVIRONMENT VARIABLES ONLY)
@@ -7,12 +7,14 @@ This package contains state management and core workflow utilities.
 from core.state import (
     AgentState,
     create_initial_state,
+    get_messages,
     merge_partial_state,
 )
 
 __all__ = [
     "AgentState",
     "create_initial_state",
+    "get_messages",
     "merge_partial_state",
 ]
 
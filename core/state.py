@@ -5,9 +5,10 @@ This module defines the state schema and state management utilities used
 throughout the LangGraph workflow.
 """
 
+from collections import deque
 from typing import Annotated, Sequence, Optional, TypedDict
-from operator import add
 from langchain_core.messages import BaseMessage
+from langgraph.graph.message import add_messages
 
 
 class AgentState(TypedDict):
@@ -16,7 +17,8 @@ class AgentState(TypedDict):
     
     This TypedDict defines the structure of state that flows through the
     LangGraph workflow. All nodes must return partial state dictionaries
-    that conform to this schema.
+    that conform to this schema; a node's "messages" entry holds only the
+    messages it adds, which the reducer appends to the conversation.
     
     Attributes:
         messages: Sequence of conversation messages (HumanMessage, AIMessage, etc.)
@@ -25,14 +27,40 @@ class AgentState(TypedDict):
         last_error: Most recent error message (or None if no error)
         reasoning: Supervisor's reasoning for the last routing decision
         raw_data: Structured data that the Data_Analyst is working with (for Business_Strategist to use)
+        has_analysis: Whether the Data_Analyst has produced an "ANALYSIS:" result
+        has_strategy: Whether the Business_Strategist has produced a "STRATEGY:" result
+        routing_history: The supervisor's last few routing decisions, oldest first
     """
-    # Use operator.add as reducer for messages - this tells LangGraph how to merge message sequences
-    messages: Annotated[Sequence[BaseMessage], add]
+    # add_messages appends each node's new messages (replacing any with a matching id)
+    messages: Annotated[list[BaseMessage], add_messages]
     next_agent: Optional[str]
     iteration_count: int
     last_error: Optional[str]
     reasoning: Optional[str]
     raw_data: Optional[dict]  # Structured data extracted from analysis results
+    has_analysis: bool
+    has_strategy: bool
+    routing_history: list[str]
+
+
+# Field names of AgentState, computed once for merge_partial_state
+_STATE_FIELDS: frozenset = frozenset(AgentState.__annotations__)
+
+
+def get_messages(state) -> Sequence[BaseMessage]:
+    """
+    Return the conversation messages from a state dict or state-like object.
+    
+    Args:
+        state: AgentState dict, or any object with a messages attribute
+        
+    Returns:
+        The state's messages, or an empty tuple if it has none
+    """
+    try:
+        return state["messages"]
+    except (KeyError, TypeError):
+        return getattr(state, "messages", ())
 
 
 def create_initial_state(query: str) -> AgentState:
@@ -54,6 +82,9 @@ def create_initial_state(query: str) -> AgentState:
         "last_error": None,
         "reasoning": None,
         "raw_data": None,
+        "has_analysis": False,
+        "has_strategy": False,
+        "routing_history": [],
     }
 
 
@@ -62,7 +93,11 @@ def merge_partial_state(state: AgentState, partial: dict) -> AgentState:
     Safely merge a partial state update into the full state.
     
     This function ensures that state updates are applied correctly and
-    that all required fields are maintained.
+    that all required fields are maintained. New messages are appended, as
+    the graph's messages reducer does, and keys that are not AgentState
+    fields are ignored. A bounded deque of messages (the message window kept
+    by EnterpriseDataTeam.run_stream) is extended in place instead of copied,
+    dropping its oldest messages.
     
     Args:
         state: Current full state
@@ -72,26 +107,16 @@ def merge_partial_state(state: AgentState, partial: dict) -> AgentState:
         Updated state with partial changes applied
     """
     updated = state.copy()
+    updated.update({key: value for key, value in partial.items() if key in _STATE_FIELDS})
     
-    # Update messages if provided
+    # Nodes return only the messages they add; append them in one new list
     if "messages" in partial:
-        updated["messages"] = list(partial["messages"])
-    
-    # Update iteration count if provided
-    if "iteration_count" in partial:
-        updated["iteration_count"] = int(partial["iteration_count"])
-    
-    # Update next agent if provided
-    if "next_agent" in partial:
-        updated["next_agent"] = partial["next_agent"]
-    
-    # Update error if provided
-    if "last_error" in partial:
-        updated["last_error"] = partial["last_error"]
-    
-    # Update reasoning if provided
-    if "reasoning" in partial:
-        updated["reasoning"] = partial["reasoning"]
+        messages = state["messages"]
+        if isinstance(messages, deque):
+            messages.extend(partial["messages"])
+            updated["messages"] = messages
+        else:
+            updated["messages"] = [*messages, *partial["messages"]]
     
     return updated
 
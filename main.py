@@ -12,7 +12,7 @@ import logging
 import sys
 import uvicorn
 from utils import setup_logging
-from config import API_HOST, API_PORT, validate_api_keys
+from config import API_HOST, API_PORT, API_WORKERS, API_KEEPALIVE_TIMEOUT, LOG_LEVEL, validate_api_keys
 from api import app
 
 # Setup logging
@@ -55,13 +55,19 @@ def main():
     logger.info("=" * 80)
     logger.info(f"Server will be available at http://{API_HOST}:{API_PORT}")
     logger.info(f"API documentation available at http://{API_HOST}:{API_PORT}/docs")
+    logger.info(f"Worker processes: {API_WORKERS}")
     logger.info("=" * 80)
     
+    # Multiple workers require an import string so each process loads the app;
+    # uvloop and httptools are picked automatically when installed (uvicorn[standard])
     uvicorn.run(
-        app,
+        "api:app" if API_WORKERS > 1 else app,
         host=API_HOST,
         port=API_PORT,
-        log_level="info"
+        workers=API_WORKERS,
+        timeout_keep_alive=API_KEEPALIVE_TIMEOUT,
+        backlog=2048,
+        log_level=LOG_LEVEL.lower()
     )
 
 
@@ -4,97 +4,121 @@ Pytest configuration and shared fixtures.
 This module provides common test fixtures and configuration for all tests.
 """
 
-"""
-Pytest configuration and shared fixtures.
+import copy
+import importlib.util
+import pytest
+from unittest.mock import MagicMock
+from typing import TYPE_CHECKING
 
-This module provides common test fixtures and configuration for all tests.
-"""
+# LangChain and project modules are imported inside the fixtures that need them,
+# so collecting tests that never touch an LLM does not pay for those imports
+if TYPE_CHECKING:
+    from core.state import AgentState
 
-import pytest
-from unittest.mock import Mock, MagicMock
-from typing import Generator
-
-# Try to import LangChain modules (may not be available in test environment)
-try:
-    from langchain_core.messages import HumanMessage, AIMessage
-    from langchain_openai import ChatOpenAI
-    LANGCHAIN_AVAILABLE = True
-except ImportError:
-    LANGCHAIN_AVAILABLE = False
-    # Create mock classes if LangChain is not available
-    class HumanMessage:
-        def __init__(self, content):
-            self.content = content
+
+# The API tests need FastAPI; leave them out of collection when it is not installed
+collect_ignore = [] if importlib.util.find_spec("fastapi") else ["test_api.py"]
+
+
+class StubLLM:
+    """
+    Lightweight stand-in for ChatOpenAI in agent tests.
     
-    class AIMessage:
-        def __init__(self, content):
-            self.content = content
+    Provides only what the agents touch; the chain-building methods are
+    MagicMocks so tests can configure and assert on them.
+    """
+    model_name = "gpt-4o"
+    temperature = 0.0
     
-    class ChatOpenAI:
-        pass
+    def __init__(self):
+        self.bind_tools = MagicMock()
+        self.with_structured_output = MagicMock()
+        self.invoke = MagicMock()
+
 
-# Import project modules
-try:
-    from core.state import AgentState, create_initial_state
-    from tools.security import is_code_safe
-    from tools.analysis_tools import execute_python_analysis, generate_chart_config
-except ImportError as e:
-    # Handle import errors gracefully for test discovery
-    pytest.skip(f"Project modules not available: {e}", allow_module_level=True)
+@pytest.fixture(scope="session")
+def _sample_state_template() -> "AgentState":
+    """
+    Build the sample workflow state once per session.
+    
+    Returns:
+        AgentState with test data (never handed to tests directly)
+    """
+    state_module = pytest.importorskip("core.state")
+    return state_module.create_initial_state("Test query for data analysis")
 
 
 @pytest.fixture
-def sample_state() -> AgentState:
+def sample_state(_sample_state_template) -> "AgentState":
     """
     Create a sample workflow state for testing.
     
     Returns:
-        AgentState with test data
+        Deep copy of the session template, so tests may mutate it freely
     """
-    return create_initial_state("Test query for data analysis")
+    return copy.deepcopy(_sample_state_template)
 
 
 @pytest.fixture
-def mock_llm():
+def mock_llm() -> StubLLM:
     """
     Create a mock LLM instance for testing.
     
+    A fresh stub per test: agents cache chains per LLM instance, so sharing
+    one would leak chains and call counts between tests.
+    
     Returns:
-        Mock ChatOpenAI instance
+        StubLLM instance
     """
-    mock = Mock(spec=ChatOpenAI)
-    mock.model_name = "gpt-4o"
-    mock.temperature = 0.0
-    return mock
+    return StubLLM()
 
 
-@pytest.fixture
-def safe_code_samples() -> list[str]:
+@pytest.fixture(scope="session")
+def default_team():
     """
-    Provide a list of safe code samples for testing.
+    Build one default-configured team for tests that only inspect it.
+    
+    Building a team compiles the LangGraph workflow, so read-only tests share
+    this instance; tests that patch the team or its workflow build their own.
     
     Returns:
-        List of safe Python code strings
+        EnterpriseDataTeam backed by a StubLLM
     """
-    return [
+    team_module = pytest.importorskip("workflow.team")
+    return team_module.EnterpriseDataTeam(llm=StubLLM())
+
+
+@pytest.fixture(scope="session")
+def safe_code_samples() -> tuple[str, ...]:
+    """
+    Provide safe code samples for testing.
+    
+    Shared by the whole session, so it is a tuple that tests cannot mutate.
+    
+    Returns:
+        Tuple of safe Python code strings
+    """
+    return (
         "import pandas as pd",
         "df = pd.DataFrame({'a': [1, 2, 3]})",
         "result = df.describe()",
         "x = 5 + 3",
         "data = [1, 2, 3, 4, 5]",
         "avg = sum(data) / len(data)",
-    ]
+    )
 
 
-@pytest.fixture
-def unsafe_code_samples() -> list[str]:
+@pytest.fixture(scope="session")
+def unsafe_code_samples() -> tuple[str, ...]:
     """
-    Provide a list of unsafe code samples for testing.
+    Provide unsafe code samples for testing.
+    
+    Shared by the whole session, so it is a tuple that tests cannot mutate.
     
     Returns:
-        List of unsafe Python code strings
+        Tuple of unsafe Python code strings
     """
-    return [
+    return (
         "import os",
         "import sys",
         "import subprocess",
@@ -103,10 +127,10 @@ def unsafe_code_samples() -> list[str]:
         "exec('dangerous_code')",
         "__import__('os')",
         "open('/etc/passwd', 'r')",
-    ]
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_analysis_response() -> str:
     """
     Provide a mock analysis response for testing.
@@ -117,7 +141,7 @@ def mock_analysis_response() -> str:
     return "ANALYSIS: Summary statistics computed successfully."
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_chart_config() -> str:
     """
     Provide a mock chart configuration for testing.
@@ -6,14 +6,94 @@ functionality and behavior.
 """
 
 import pytest
-from unittest.mock import Mock, MagicMock, patch
+from collections import OrderedDict
+from unittest.mock import Mock, MagicMock
+
+# The agents are built on LangChain; skip this module cleanly where it is not installed
+pytest.importorskip("langchain_openai")
+
 from langchain_core.messages import AIMessage
-from agents.worker import WorkerAgent, DataAnalystAgent, BusinessStrategistAgent
+from agents.worker import WorkerAgent, DataAnalystAgent, BusinessStrategistAgent, _analysis_kind
 from agents.supervisor import SupervisorAgent, RouteResponse
+from agents.chains import default_llm
 from core.state import create_initial_state
 from config import VALID_AGENTS
 
 
+@pytest.fixture
+def pending_state(sample_state):
+    """
+    State whose routing cannot be resolved by the rule-based pre-router.
+    
+    Returns:
+        AgentState where the last worker run reported an error
+    """
+    sample_state["messages"].append(AIMessage(content="[Supervisor] Routing to Data_Analyst. Reasoning: Need data"))
+    sample_state["messages"].append(AIMessage(content="ERROR: Data_Analyst encountered an error: timeout"))
+    return sample_state
+
+
+@pytest.fixture
+def mock_chat_openai(monkeypatch):
+    """
+    Replace the ChatOpenAI class used for the shared default LLM.
+    
+    A plain attribute swap through monkeypatch is enough here and is undone
+    automatically, without the start/stop bookkeeping of mock.patch.
+    
+    Yields:
+        The ChatOpenAI mock; the default_llm cache is cleared around the test
+    """
+    import agents.chains as chains
+    
+    mock_class = Mock()
+    monkeypatch.setattr(chains, "ChatOpenAI", mock_class)
+    default_llm.cache_clear()
+    yield mock_class
+    default_llm.cache_clear()
+
+
+class StubChain:
+    """Minimal chain stand-in that returns a fixed result or raises, counting calls."""
+    
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.call_count = 0
+    
+    def invoke(self, *args, **kwargs):
+        self.call_count += 1
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture(scope="class")
+def shared_supervisor():
+    """
+    Build one SupervisorAgent per test class so its chain is constructed once.
+    
+    Returns:
+        SupervisorAgent backed by a mock LLM
+    """
+    return SupervisorAgent(llm=MagicMock())
+
+
+@pytest.fixture
+def supervisor(shared_supervisor, monkeypatch):
+    """
+    Hand out the class-wide supervisor with an empty routing cache.
+    
+    Tests replace its chain through monkeypatch so the override is undone
+    after each test.
+    
+    Returns:
+        The shared SupervisorAgent
+    """
+    monkeypatch.setattr(shared_supervisor, "_routing_cache", OrderedDict())
+    return shared_supervisor
+
+
 class TestWorkerAgent:
     """Test suite for WorkerAgent base class."""
     
@@ -41,7 +121,6 @@ class TestWorkerAgent:
         
         assert worker.chain is not None
     
-    @patch('agents.worker.ChatOpenAI')
     def test_worker_creates_llm_if_none(self, mock_chat_openai):
         """Test that worker creates LLM if not provided."""
         mock_llm_instance = Mock()
@@ -54,6 +133,73 @@ class TestWorkerAgent:
         )
         
         assert worker.llm is not None
+    
+    def test_worker_runs_multiple_tool_calls_in_order(self, mock_llm, sample_state):
+        """Test that concurrent tool calls produce ToolMessages in call order."""
+        from langchain_core.tools import tool
+        
+        @tool
+        def double(x: int) -> int:
+            """Double a number."""
+            return x * 2
+        
+        @tool
+        def square(x: int) -> int:
+            """Square a number."""
+            return x * x
+        
+        worker = WorkerAgent(name="TestWorker", system_prompt="Test", tools=[double, square], llm=mock_llm)
+        first = AIMessage(content="", tool_calls=[
+            {"name": "square", "args": {"x": 3}, "id": "call_1"},
+            {"name": "double", "args": {"x": 5}, "id": "call_2"},
+            {"name": "missing", "args": {}, "id": "call_3"},
+        ])
+        worker.chain = MagicMock()
+        worker.chain.invoke = Mock(side_effect=[first, AIMessage(content="Done")])
+        
+        messages = worker.invoke(sample_state)
+        
+        tool_messages = [m for m in messages if m.type == "tool"]
+        assert [m.tool_call_id for m in tool_messages] == ["call_1", "call_2", "call_3"]
+        assert [m.content for m in tool_messages[:2]] == ["9", "10"]
+        assert "not available" in tool_messages[2].content
+        assert messages[-1].content == "Done"
+
+    
+    def test_tool_results_serialized_as_json(self):
+        """Test that structured tool results become JSON content, not Python repr."""
+        import json
+        from agents.worker import _to_content
+        
+        assert _to_content("ANALYSIS: ok") == "ANALYSIS: ok"
+        assert json.loads(_to_content({"values": [1, 2], "ok": True})) == {"values": [1, 2], "ok": True}
+        assert _to_content(42) == "42"
+    
+    def test_compile_messages_keeps_short_history(self, sample_state):
+        """Test that history within the token budget is passed through unchanged."""
+        messages = sample_state["messages"]
+        
+        assert WorkerAgent._compile_messages(messages) is messages
+    
+    def test_compile_messages_summarizes_old_history(self):
+        """Test that old messages are compiled into a single summary message."""
+        from langchain_core.messages import HumanMessage, ToolMessage
+        
+        messages = [
+            HumanMessage(content="What is our revenue?"),
+            AIMessage(content="ANALYSIS: Revenue = $2.3M\n" + "x" * 400),
+            AIMessage(content="", tool_calls=[{"name": "t", "args": {}, "id": "c1"}]),
+            ToolMessage(content="y" * 400, tool_call_id="c1"),
+            AIMessage(content="Latest"),
+        ]
+        
+        compiled = WorkerAgent._compile_messages(messages, max_tokens=50)
+        
+        assert compiled[0].content.startswith("CONTEXT SUMMARY:")
+        assert "What is our revenue?" in compiled[0].content
+        assert "ANALYSIS: Revenue = $2.3M" in compiled[0].content
+        assert compiled[1].type != "tool"
+        assert compiled[-1].content == "Latest"
 
 
 class TestDataAnalystAgent:
@@ -74,6 +220,49 @@ class TestDataAnalystAgent:
         # Should have execute_python_analysis tool
         tool_names = [tool.name for tool in agent.tools]
         assert any("analysis" in name.lower() for name in tool_names)
+    
+    def test_analyst_indexes_tools_by_name(self, mock_llm):
+        """Test that tools are indexed by name with user_query support detected."""
+        agent = DataAnalystAgent(llm=mock_llm)
+        
+        assert agent._tools_by_name["execute_python_analysis"] is agent.tools[0]
+        assert agent._tool_accepts_user_query["execute_python_analysis"] is True
+    
+    def test_analyst_prompt_cache_key_opt_in(self, monkeypatch):
+        """Test that the analyst's requests carry a per-agent prompt_cache_key when configured."""
+        from langchain_openai import ChatOpenAI
+        import agents.chains as chains
+        
+        monkeypatch.setattr(chains, "PROMPT_CACHE_KEY_PREFIX", "eda")
+        llm = ChatOpenAI(model="gpt-4o", api_key="test-key")
+        agent = DataAnalystAgent(llm=llm)
+        
+        bound_llm = agent.chain.steps[1].bound
+        assert bound_llm.model_kwargs["prompt_cache_key"] == "eda:Data_Analyst"
+        assert "prompt_cache_key" not in llm.model_kwargs
+    
+    def test_analyst_skips_llm_echo_of_tool_analysis(self, mock_llm, sample_state):
+        """Test that the tool's ANALYSIS: output is returned without a second LLM call."""
+        agent = DataAnalystAgent(llm=mock_llm)
+        first = AIMessage(content="", tool_calls=[
+            {"name": "execute_python_analysis", "args": {"code": "pass"}, "id": "call_1"},
+        ])
+        agent.chain = MagicMock()
+        agent.chain.invoke = Mock(return_value=first)
+        
+        messages = agent.invoke(sample_state)
+        
+        assert agent.chain.invoke.call_count == 1
+        assert messages[-1].content.startswith("ANALYSIS:")
+        assert "DATA:" not in messages[-1].content
+        assert "DATA:" in messages[-2].content
+    
+    def test_forced_analysis_kind_follows_keyword_priority(self):
+        """Test that forced-analysis templates are selected by keyword priority."""
+        assert _analysis_kind("Show revenue and profit margins") == "margin"
+        assert _analysis_kind("What is our REVENUE trend?") == "revenue"
+        assert _analysis_kind("Why did sales drop?") == "decline"
+        assert _analysis_kind("Summarize the data") == "general"
 
 
 class TestBusinessStrategistAgent:
@@ -93,6 +282,48 @@ class TestBusinessStrategistAgent:
         # Should have strategy_schema for structured output
         assert hasattr(agent, 'strategy_schema')
         assert agent.chain is not None
+    
+    def test_strategists_share_schema_and_chain(self, mock_llm):
+        """Test that the strategy schema is defined once and the chain is reused."""
+        first = BusinessStrategistAgent(llm=mock_llm)
+        second = BusinessStrategistAgent(llm=mock_llm)
+        
+        assert first.strategy_schema is second.strategy_schema
+        assert first.chain is second.chain
+    
+    def test_strategist_predicted_output_opt_in(self, monkeypatch):
+        """Test that the JSON skeleton is sent as a Predicted Output when enabled."""
+        from langchain_openai import ChatOpenAI
+        import agents.worker as worker_module
+        
+        monkeypatch.setattr(worker_module, "STRATEGY_PREDICTED_OUTPUT", True)
+        llm = ChatOpenAI(model="gpt-4o", api_key="test-key")
+        agent = BusinessStrategistAgent(llm=llm)
+        
+        bound_llm = agent.chain.steps[1].bound
+        assert bound_llm.model_kwargs["prediction"]["type"] == "content"
+        assert '"summary"' in bound_llm.model_kwargs["prediction"]["content"]
+        assert "prediction" not in llm.model_kwargs
+    
+    def test_strategist_serializes_structured_output(self, mock_llm, sample_state):
+        """Test that structured strategy output becomes a STRATEGY: JSON message."""
+        import json
+        
+        agent = BusinessStrategistAgent(llm=mock_llm)
+        strategy = agent.strategy_schema(
+            actions=[{"action": "Cut costs", "rating": 9, "rationale": "Margins fell 5%"}],
+            summary="Recover margins"
+        )
+        agent.chain = MagicMock()
+        agent.chain.invoke = Mock(return_value=strategy)
+        
+        messages = agent.invoke(sample_state)
+        
+        content = messages[0].content
+        assert content.startswith("STRATEGY: ")
+        payload = json.loads(content[len("STRATEGY: "):])
+        assert payload["actions"][0]["rating"] == 9
+        assert payload["summary"] == "Recover margins"
 
 
 class TestSupervisorAgent:
@@ -104,8 +335,15 @@ class TestSupervisorAgent:
         
         assert supervisor.llm == mock_llm
         assert supervisor.chain is not None
-    
-    @patch('agents.supervisor.ChatOpenAI')
+
+    def test_supervisor_reuses_chain_for_same_llm(self, mock_llm):
+        """Test that supervisors sharing an LLM share the built chain."""
+        first = SupervisorAgent(llm=mock_llm)
+        second = SupervisorAgent(llm=mock_llm)
+
+        assert first.chain is second.chain
+        assert mock_llm.with_structured_output.call_count == 1
+
     def test_supervisor_creates_llm_if_none(self, mock_chat_openai):
         """Test that supervisor creates LLM if not provided."""
         mock_llm_instance = Mock()
@@ -115,55 +353,178 @@ class TestSupervisorAgent:
         
         assert supervisor.llm is not None
     
-    def test_supervisor_decide_returns_valid_agent(self, mock_llm, sample_state):
-        """Test that supervisor returns valid agent names."""
-        supervisor = SupervisorAgent(llm=mock_llm)
+    def test_default_llm_is_shared(self, mock_chat_openai):
+        """Test that agents created without an LLM share one client."""
+        supervisor = SupervisorAgent()
+        analyst = DataAnalystAgent()
         
-        # Mock the chain to return a valid decision
-        mock_decision = Mock(spec=RouteResponse)
-        mock_decision.next = "Data_Analyst"
-        mock_decision.reasoning = "Need to analyze data"
+        assert supervisor.llm is analyst.llm
+        assert mock_chat_openai.call_count == 1
+    
+    def test_default_llm_caches_deterministic_responses(self, mock_chat_openai):
+        """Test that the shared client gets a response cache only at temperature 0."""
+        from langchain_core.caches import InMemoryCache
         
-        # Replace chain with a MagicMock that has an invoke method
-        mock_chain = MagicMock()
-        mock_chain.invoke = Mock(return_value=mock_decision)
-        supervisor.chain = mock_chain
+        default_llm("gpt-4o", 0.0)
+        default_llm("gpt-4o", 0.7)
+        
+        deterministic, sampled = mock_chat_openai.call_args_list
+        assert isinstance(deterministic.kwargs["cache"], InMemoryCache)
+        assert "cache" not in sampled.kwargs
+    
+    def test_supervisor_decide_returns_valid_agent(self, supervisor, monkeypatch, sample_state):
+        """Test that supervisor returns valid agent names."""
+        # Mock the chain to return a valid decision
+        mock_decision = RouteResponse.model_construct(next="Data_Analyst", reasoning="Need to analyze data")
+        mock_chain = StubChain(mock_decision)
+        monkeypatch.setattr(supervisor, "chain", mock_chain)
         
         next_agent, reasoning = supervisor.decide(sample_state)
         
         assert next_agent in VALID_AGENTS
         assert isinstance(reasoning, str)
     
-    def test_supervisor_handles_invalid_agent(self, mock_llm, sample_state):
+    def test_supervisor_handles_invalid_agent(self, supervisor, monkeypatch, pending_state):
         """Test that supervisor handles invalid agent names."""
-        supervisor = SupervisorAgent(llm=mock_llm)
-        
         # Mock the chain to return an invalid decision
-        mock_decision = Mock(spec=RouteResponse)
-        mock_decision.next = "InvalidAgent"
-        mock_decision.reasoning = "Invalid reasoning"
-        
-        # Replace chain with a MagicMock that has an invoke method
-        mock_chain = MagicMock()
-        mock_chain.invoke = Mock(return_value=mock_decision)
-        supervisor.chain = mock_chain
+        mock_decision = RouteResponse.model_construct(next="InvalidAgent", reasoning="Invalid reasoning")
+        mock_chain = StubChain(mock_decision)
+        monkeypatch.setattr(supervisor, "chain", mock_chain)
         
-        next_agent, reasoning = supervisor.decide(sample_state)
+        next_agent, reasoning = supervisor.decide(pending_state)
         
         assert next_agent == "FINISH"
         assert "Invalid" in reasoning or "invalid" in reasoning.lower()
     
-    def test_supervisor_handles_exceptions(self, mock_llm, sample_state):
-        """Test that supervisor handles exceptions gracefully."""
-        supervisor = SupervisorAgent(llm=mock_llm)
+    def test_supervisor_maps_legacy_visualizer(self, supervisor, monkeypatch, pending_state):
+        """Test that a legacy Visualizer decision is routed to Business_Strategist."""
+        mock_decision = RouteResponse.model_construct(next="visualizer", reasoning="Chart it")
+        mock_chain = StubChain(mock_decision)
+        monkeypatch.setattr(supervisor, "chain", mock_chain)
         
-        # Replace chain with a MagicMock that raises an exception
-        mock_chain = MagicMock()
-        mock_chain.invoke = Mock(side_effect=Exception("Test error"))
-        supervisor.chain = mock_chain
+        next_agent, _ = supervisor.decide(pending_state)
         
-        next_agent, reasoning = supervisor.decide(sample_state)
+        assert next_agent == "Business_Strategist"
+    
+    def test_supervisor_handles_exceptions(self, supervisor, monkeypatch, pending_state):
+        """Test that supervisor handles exceptions gracefully."""
+        mock_chain = StubChain(error=Exception("Test error"))
+        monkeypatch.setattr(supervisor, "chain", mock_chain)
+        
+        next_agent, reasoning = supervisor.decide(pending_state)
         
         assert next_agent == "FINISH"
         assert "error" in reasoning.lower() or "Error" in reasoning
 
+    
+    def test_supervisor_finishes_when_strategy_present(self, supervisor, monkeypatch, sample_state):
+        """Test that a completed strategy terminates without an LLM call."""
+        mock_chain = StubChain(error=AssertionError("LLM should not be called"))
+        monkeypatch.setattr(supervisor, "chain", mock_chain)
+        
+        sample_state["messages"].append(AIMessage(content="ANALYSIS: Revenue up 10%"))
+        sample_state["messages"].append(AIMessage(content="STRATEGY: {\"actions\": []}"))
+        
+        next_agent, reasoning = supervisor.decide(sample_state)
+        
+        assert next_agent == "FINISH"
+        assert mock_chain.call_count == 0
+    
+    def test_supervisor_caches_routing_decisions(self, supervisor, monkeypatch, sample_state):
+        """Test that repeated conversation fingerprints reuse the cached decision."""
+        mock_decision = RouteResponse.model_construct(next="Data_Analyst", reasoning="Need to analyze data")
+        
+        mock_chain = StubChain(mock_decision)
+        monkeypatch.setattr(supervisor, "chain", mock_chain)
+        
+        # Worker output without a marker is left to the LLM but carries no error
+        sample_state["messages"].append(AIMessage(content="Looking into the revenue figures"))
+        first = supervisor.decide(sample_state)
+        second = supervisor.decide(sample_state)
+        
+        assert first == second == ("Data_Analyst", "Need to analyze data")
+        assert mock_chain.call_count == 1
+    
+    def test_supervisor_cache_is_keyed_by_query(self, supervisor, monkeypatch, sample_state):
+        """Test that an ambiguous turn of a different query is not answered from the cache."""
+        from langchain_core.messages import HumanMessage
+        
+        mock_chain = StubChain(RouteResponse.model_construct(next="Data_Analyst", reasoning="Need data"))
+        monkeypatch.setattr(supervisor, "chain", mock_chain)
+        
+        sample_state["messages"].append(AIMessage(content="Looking into the figures"))
+        supervisor.decide(sample_state)
+        sample_state["messages"] = [HumanMessage(content="Analyze churn"), AIMessage(content="Looking into the figures")]
+        supervisor.decide(sample_state)
+        
+        assert mock_chain.call_count == 2
+        assert set(supervisor._routing_cache) == {"Test query for data analysis", "Analyze churn"}
+    
+    def test_supervisor_does_not_cache_failures(self, supervisor, monkeypatch, pending_state):
+        """Test that failed decisions are retried rather than cached."""
+        mock_chain = StubChain(error=Exception("Test error"))
+        monkeypatch.setattr(supervisor, "chain", mock_chain)
+        
+        supervisor.decide(pending_state)
+        supervisor.decide(pending_state)
+        
+        assert mock_chain.call_count == 2
+    
+    def test_supervisor_does_not_cache_error_decisions(self, supervisor, monkeypatch, pending_state):
+        """Test that decisions made after a worker error are not replayed for the same query."""
+        mock_decision = RouteResponse.model_construct(next="FINISH", reasoning="Analysis keeps failing")
+        mock_chain = StubChain(mock_decision)
+        monkeypatch.setattr(supervisor, "chain", mock_chain)
+        
+        supervisor.decide(pending_state)
+        supervisor.decide(pending_state)
+        
+        assert mock_chain.call_count == 2
+        assert not supervisor._routing_cache
+    
+    @pytest.mark.parametrize("raw_next, expected", [
+        ("Visualizer", "Business_Strategist"),
+        ("Chart_Visualizer_Bot", "FINISH"),
+    ], ids=["legacy-visualizer", "substring-is-invalid"])
+    def test_supervisor_maps_only_the_legacy_visualizer(self, supervisor, monkeypatch, pending_state, raw_next, expected):
+        """Test that only the exact legacy Visualizer name is mapped to the strategist."""
+        monkeypatch.setattr(supervisor, "chain", StubChain(RouteResponse.model_construct(next=raw_next, reasoning="r")))
+        
+        assert supervisor.decide(pending_state)[0] == expected
+    
+    def test_route_schema_constrains_agent_names(self):
+        """Test that the routing schema exposes the valid agents as an enum."""
+        from agents.supervisor import _ROUTE_SCHEMA
+        
+        assert set(_ROUTE_SCHEMA["properties"]["next"]["enum"]) == VALID_AGENTS
+        assert RouteResponse(next="Visualizer", reasoning="legacy").next == "Business_Strategist"
+    
+    def test_supervisor_normalizes_dict_decisions(self, supervisor, monkeypatch, pending_state):
+        """Test that raw structured-output dicts are normalized without full validation."""
+        mock_chain = StubChain({"next": " strategist ", "reasoning": "Analysis done"})
+        monkeypatch.setattr(supervisor, "chain", mock_chain)
+        
+        next_agent, reasoning = supervisor.decide(pending_state)
+        
+        assert next_agent == "Business_Strategist"
+        assert reasoning == "Analysis done"
+    
+    def test_fast_route_sends_new_query_to_analyst(self, supervisor, monkeypatch, sample_state):
+        """Test that a fresh query is routed to Data_Analyst without an LLM call."""
+        mock_chain = StubChain()
+        monkeypatch.setattr(supervisor, "chain", mock_chain)
+        
+        next_agent, _ = supervisor.decide(sample_state)
+        
+        assert next_agent == "Data_Analyst"
+        assert mock_chain.call_count == 0
+    
+    def test_fast_route_sends_analysis_to_strategist(self, mock_llm, sample_state):
+        """Test that completed analysis is routed to Business_Strategist."""
+        sample_state["messages"].append(AIMessage(content="ANALYSIS: Q1 Revenue = $2.3M"))
+        
+        assert SupervisorAgent._fast_route(sample_state["messages"])[0] == "Business_Strategist"
+    
+    def test_fast_route_defers_errors_to_llm(self, pending_state):
+        """Test that worker errors are left to the LLM to decide."""
+        assert SupervisorAgent._fast_route(pending_state["messages"]) is None
@@ -0,0 +1,75 @@
+"""
+Unit tests for query validation.
+
+This module tests the heuristics used to reject absurd or overly
+vague queries before they reach the workflow.
+"""
+
+import pytest
+from utils.query_validator import is_query_absurd, is_query_too_ambiguous
+
+
+class TestIsQueryAbsurd:
+    """Test suite for is_query_absurd function."""
+    
+    @pytest.mark.parametrize("query", [
+        "Analyze profit margins by region",
+        "What are our revenue trends?",
+        "Show Q1 revenue",
+    ])
+    def test_accepts_analysis_questions(self, query):
+        """Test that ordinary analysis questions pass."""
+        assert is_query_absurd(query) == (False, None)
+    
+    @pytest.mark.parametrize("query", [
+        "tell me a joke please",
+        "sing me a song",
+        "play music now",
+        "Can you sketch our org chart",
+        "what color is the sky",
+    ])
+    def test_rejects_non_analysis_requests(self, query):
+        """Test that non-analysis requests are rejected."""
+        is_absurd, reason = is_query_absurd(query)
+        
+        assert is_absurd
+        assert reason
+    
+    def test_reports_unrelated_keyword(self):
+        """Test that short off-topic queries name the matched keyword."""
+        is_absurd, reason = is_query_absurd("weather today")
+        
+        assert is_absurd
+        assert "'weather'" in reason
+    
+    def test_rejects_empty_query(self):
+        """Test that blank queries are rejected."""
+        assert is_query_absurd("   ") == (True, "Query is empty")
+    
+    def test_repeated_query_is_cached(self):
+        """Test that a repeated query is answered from the cache."""
+        is_query_absurd.cache_clear()
+        
+        assert is_query_absurd("Show Q2 margins") == is_query_absurd("Show Q2 margins")
+        assert is_query_absurd.cache_info().hits == 1
+
+
+class TestIsQueryTooAmbiguous:
+    """Test suite for is_query_too_ambiguous function."""
+    
+    @pytest.mark.parametrize("query", [
+        "How are we doing?",
+        "what's our performance like?",
+        "Tell me about our business",
+    ])
+    def test_flags_vague_queries(self, query):
+        """Test that vague queries are flagged with a suggestion."""
+        is_vague, suggestion = is_query_too_ambiguous(query)
+        
+        assert is_vague
+        assert "Please specify" in suggestion
+    
+    def test_accepts_specific_queries(self):
+        """Test that specific queries are not flagged."""
+        assert is_query_too_ambiguous("What is our performance in Q3 by region?") == (False, None)
+
@@ -12,67 +12,55 @@ from tools.security import is_code_safe, validate_code_safety, SecurityViolation
 class TestCodeSafety:
     """Test suite for code safety validation."""
     
-    def test_safe_code_imports_pandas(self, safe_code_samples):
-        """Test that safe pandas imports are allowed."""
-        code = "import pandas as pd"
-        assert is_code_safe(code) is True
-    
-    def test_safe_code_basic_operations(self, safe_code_samples):
-        """Test that basic mathematical operations are safe."""
-        code = "x = 5 + 3; y = x * 2"
-        assert is_code_safe(code) is True
-    
-    def test_safe_code_dataframe_operations(self, safe_code_samples):
-        """Test that DataFrame operations are safe."""
-        code = "df = pd.DataFrame({'a': [1, 2, 3]}); result = df.describe()"
+    @pytest.mark.parametrize("code", [
+        "import pandas as pd",
+        "x = 5 + 3; y = x * 2",
+        "df = pd.DataFrame({'a': [1, 2, 3]}); result = df.describe()",
+        "import pandas as pd\nimport numpy as np\nimport matplotlib.pyplot as plt",
+        # Empty code should parse but be safe
+        "",
+    ], ids=[
+        "imports_pandas",
+        "basic_operations",
+        "dataframe_operations",
+        "multiple_safe_imports",
+        "empty_code",
+    ])
+    def test_safe_code_allowed(self, code):
+        """Test that safe code is allowed."""
         assert is_code_safe(code) is True
     
-    def test_unsafe_code_import_os(self, unsafe_code_samples):
-        """Test that os module import is blocked."""
-        code = "import os"
-        assert is_code_safe(code) is False
-    
-    def test_unsafe_code_import_sys(self, unsafe_code_samples):
-        """Test that sys module import is blocked."""
-        code = "import sys"
-        assert is_code_safe(code) is False
-    
-    def test_unsafe_code_import_subprocess(self, unsafe_code_samples):
-        """Test that subprocess module import is blocked."""
-        code = "import subprocess"
-        assert is_code_safe(code) is False
-    
-    def test_unsafe_code_eval(self, unsafe_code_samples):
-        """Test that eval() usage is blocked."""
-        code = "eval('malicious_code')"
-        assert is_code_safe(code) is False
-    
-    def test_unsafe_code_exec(self, unsafe_code_samples):
-        """Test that exec() usage is blocked."""
-        code = "exec('dangerous_code')"
-        assert is_code_safe(code) is False
-    
-    def test_unsafe_code_dunder_methods(self):
-        """Test that code with dunder methods is blocked."""
-        code = "obj.__class__"
+    @pytest.mark.parametrize("code", [
+        "import os",
+        "import sys",
+        "import subprocess",
+        "eval('malicious_code')",
+        "exec('dangerous_code')",
+        "obj.__class__",
+        "open('/etc/passwd', 'r')",
+        "from os import system",
+        "from subprocess import call",
+        "import pandas as pd\nimport os",
+        "def invalid syntax here",
+        "\uff4f\uff53.system('ls')",
+    ], ids=[
+        "import_os",
+        "import_sys",
+        "import_subprocess",
+        "eval",
+        "exec",
+        "dunder_methods",
+        "open_function",
+        "import_from_statement",
+        "nested_import",
+        "mixed_safe_and_unsafe_imports",
+        "invalid_syntax",
+        "fullwidth_identifier",
+    ])
+    def test_unsafe_code_blocked(self, code):
+        """Test that unsafe or unparseable code is blocked."""
         assert is_code_safe(code) is False
     
-    def test_unsafe_code_open_function(self, unsafe_code_samples):
-        """Test that open() function usage is blocked."""
-        code = "open('/etc/passwd', 'r')"
-        assert is_code_safe(code) is False
-    
-    def test_invalid_syntax_handled(self):
-        """Test that invalid Python syntax is handled gracefully."""
-        code = "def invalid syntax here"
-        assert is_code_safe(code) is False
-    
-    def test_empty_code(self):
-        """Test that empty code is considered safe."""
-        code = ""
-        # Empty code should parse but be safe
-        assert is_code_safe(code) is True
-    
     def test_validate_code_safety_returns_none_for_safe_code(self):
         """Test that validate_code_safety returns None for safe code."""
         code = "import pandas as pd"
@@ -85,24 +73,13 @@ class TestCodeSafety:
         result = validate_code_safety(code)
         assert isinstance(result, SecurityViolationError)
         assert "Security violation" in str(result)
-    
-    def test_import_from_statement_blocked(self):
-        """Test that 'from os import' statements are blocked."""
-        code = "from os import system"
-        assert is_code_safe(code) is False
-    
-    def test_nested_import_blocked(self):
-        """Test that nested dangerous imports are blocked."""
-        code = "from subprocess import call"
-        assert is_code_safe(code) is False
-    
-    def test_multiple_safe_imports(self):
-        """Test that multiple safe imports are allowed."""
-        code = "import pandas as pd\nimport numpy as np\nimport matplotlib.pyplot as plt"
-        assert is_code_safe(code) is True
-    
-    def test_mixed_safe_and_unsafe_imports(self):
-        """Test that mixed imports are blocked if any unsafe."""
-        code = "import pandas as pd\nimport os"
-        assert is_code_safe(code) is False
 
+    
+    def test_security_import_does_not_load_langchain(self):
+        """Test that importing the tools package defers the LangChain-backed tools."""
+        import subprocess
+        import sys
+        
+        script = "import sys, tools.security; print(any(m.startswith('langchain') for m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == "False"
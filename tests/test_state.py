@@ -6,14 +6,30 @@ used throughout the workflow.
 """
 
 import pytest
+
+# Needs LangChain; skip this module cleanly where it is not installed
+pytest.importorskip("langchain_core")
+
 from langchain_core.messages import HumanMessage, AIMessage
 from core.state import (
     AgentState,
     create_initial_state,
+    get_messages,
     merge_partial_state
 )
 
 
+@pytest.fixture(scope="class")
+def default_state():
+    """
+    Build one initial state for the read-only structure checks.
+    
+    Returns:
+        AgentState created from "Test query"
+    """
+    return create_initial_state("Test query")
+
+
 class TestCreateInitialState:
     """Test suite for create_initial_state function."""
     
@@ -25,73 +41,73 @@ class TestCreateInitialState:
         assert state["messages"][0].content == query
         assert isinstance(state["messages"][0], HumanMessage)
     
-    def test_initial_state_has_correct_structure(self):
+    def test_initial_state_has_correct_structure(self, default_state):
         """Test that initial state has all required fields."""
-        query = "Test query"
-        state = create_initial_state(query)
-        
-        assert "messages" in state
-        assert "next_agent" in state
-        assert "iteration_count" in state
-        assert "last_error" in state
-        assert "reasoning" in state
+        assert "messages" in default_state
+        assert "next_agent" in default_state
+        assert "iteration_count" in default_state
+        assert "last_error" in default_state
+        assert "reasoning" in default_state
     
-    def test_initial_state_defaults(self):
+    def test_initial_state_defaults(self, default_state):
         """Test that initial state has correct default values."""
-        query = "Test query"
-        state = create_initial_state(query)
-        
-        assert state["next_agent"] is None
-        assert state["iteration_count"] == 0
-        assert state["last_error"] is None
-        assert state["reasoning"] is None
+        assert default_state["next_agent"] is None
+        assert default_state["iteration_count"] == 0
+        assert default_state["last_error"] is None
+        assert default_state["reasoning"] is None
+        assert default_state["has_analysis"] is False
+        assert default_state["has_strategy"] is False
 
 
 class TestMergePartialState:
     """Test suite for merge_partial_state function."""
     
     def test_merges_messages(self, sample_state):
-        """Test that messages are merged correctly."""
+        """Test that a node's new messages are appended to the conversation."""
         new_message = AIMessage(content="Test response")
-        partial = {"messages": sample_state["messages"] + [new_message]}
+        partial = {"messages": [new_message]}
         
         updated = merge_partial_state(sample_state, partial)
         
         assert len(updated["messages"]) == len(sample_state["messages"]) + 1
         assert updated["messages"][-1] == new_message
     
-    def test_merges_iteration_count(self, sample_state):
-        """Test that iteration count is merged correctly."""
-        partial = {"iteration_count": 5}
+    def test_converts_message_tuple_to_list(self, sample_state):
+        """Test that non-list message sequences are appended into a new list."""
+        new_message = AIMessage(content="Test response")
+        partial = {"messages": (new_message,)}
         
         updated = merge_partial_state(sample_state, partial)
         
-        assert updated["iteration_count"] == 5
-        assert isinstance(updated["iteration_count"], int)
+        assert updated["messages"] == [*sample_state["messages"], new_message]
+        assert isinstance(updated["messages"], list)
+        assert updated["messages"] is not sample_state["messages"]
     
-    def test_merges_next_agent(self, sample_state):
-        """Test that next_agent is merged correctly."""
-        partial = {"next_agent": "Data_Analyst"}
-        
-        updated = merge_partial_state(sample_state, partial)
+    def test_extends_message_window_in_place(self, sample_state):
+        """Test that a bounded message deque keeps only the newest messages."""
+        from collections import deque
         
-        assert updated["next_agent"] == "Data_Analyst"
-    
-    def test_merges_last_error(self, sample_state):
-        """Test that last_error is merged correctly."""
-        partial = {"last_error": "Test error message"}
+        window = deque(sample_state["messages"], maxlen=2)
+        new_messages = [AIMessage(content="First"), AIMessage(content="Second")]
         
-        updated = merge_partial_state(sample_state, partial)
+        updated = merge_partial_state({**sample_state, "messages": window}, {"messages": new_messages})
         
-        assert updated["last_error"] == "Test error message"
+        assert updated["messages"] is window
+        assert list(window) == new_messages
     
-    def test_merges_reasoning(self, sample_state):
-        """Test that reasoning is merged correctly."""
-        partial = {"reasoning": "Test reasoning"}
-        
-        updated = merge_partial_state(sample_state, partial)
-        
-        assert updated["reasoning"] == "Test reasoning"
+    @pytest.mark.parametrize("field, value", [
+        ("iteration_count", 5),
+        ("next_agent", "Data_Analyst"),
+        ("last_error", "Test error message"),
+        ("reasoning", "Test reasoning"),
+        ("raw_data", {"revenue": [100, 200]}),
+    ])
+    def test_merges_field(self, sample_state, field, value):
+        """Test that a single-field update is merged correctly."""
+        updated = merge_partial_state(sample_state, {field: value})
+        
+        assert updated[field] == value
+        assert type(updated[field]) is type(value)
     
     def test_merges_multiple_fields(self, sample_state):
         """Test that multiple fields can be merged at once."""
@@ -117,6 +133,12 @@ class TestMergePartialState:
         assert updated["messages"] == original_messages
         assert updated["next_agent"] == sample_state["next_agent"]
     
+    def test_ignores_unknown_keys(self, sample_state):
+        """Test that keys outside the state schema are not merged."""
+        updated = merge_partial_state(sample_state, {"unexpected": 1})
+        
+        assert "unexpected" not in updated
+    
     def test_empty_partial_does_not_change_state(self, sample_state):
         """Test that empty partial doesn't change state."""
         partial = {}
@@ -126,3 +148,21 @@ class TestMergePartialState:
         
         assert updated == original
 
+
+class TestGetMessages:
+    """Test suite for get_messages function."""
+    
+    def test_reads_dict_state(self, sample_state):
+        """Test that messages are read from a state dict."""
+        assert get_messages(sample_state) is sample_state["messages"]
+    
+    def test_reads_attribute_state(self):
+        """Test that messages are read from state-like objects."""
+        class StateObject:
+            messages = [HumanMessage(content="Hi")]
+        
+        assert get_messages(StateObject())[0].content == "Hi"
+    
+    def test_missing_messages_returns_empty(self):
+        """Test that a state without messages yields an empty sequence."""
+        assert len(get_messages({})) == 0
@@ -7,11 +7,28 @@ it orchestrates agents correctly and handles edge cases.
 
 import pytest
 from unittest.mock import Mock, MagicMock, patch
+
+# Needs LangChain; skip this module cleanly where it is not installed
+pytest.importorskip("langchain_core")
+
 from langchain_core.messages import HumanMessage, AIMessage
 from workflow.team import EnterpriseDataTeam
 from core.state import create_initial_state
 
 
+class StubStream:
+    """Minimal stand-in for workflow.stream that yields fixed steps or raises."""
+    
+    def __init__(self, steps=(), error=None):
+        self.steps = steps
+        self.error = error
+    
+    def __call__(self, *args, **kwargs):
+        if self.error is not None:
+            raise self.error
+        return iter(self.steps)
+
+
 class TestEnterpriseDataTeam:
     """Test suite for EnterpriseDataTeam workflow."""
     
@@ -30,38 +47,35 @@ class TestEnterpriseDataTeam:
         assert team.analyst_agent is not None
         assert team.strategist_agent is not None
     
-    def test_team_creates_workflow_graph(self, mock_llm):
+    def test_team_creates_workflow_graph(self, default_team):
         """Test that team creates a workflow graph."""
-        team = EnterpriseDataTeam(llm=mock_llm)
-        
-        assert team.workflow is not None
+        assert default_team.workflow is not None
     
-    def test_team_uses_default_config(self, mock_llm):
+    def test_team_uses_default_config(self, default_team):
         """Test that team uses default configuration when not specified."""
-        team = EnterpriseDataTeam(llm=mock_llm)
-        
-        assert team.max_iterations > 0
-        assert team.message_window > 0
+        assert default_team.max_iterations > 0
+        assert default_team.message_window > 0
     
     def test_run_stream_yields_start_event(self, mock_llm):
         """Test that run_stream yields a start event."""
         team = EnterpriseDataTeam(llm=mock_llm)
         
         # Mock the workflow stream to return empty (to avoid actual LLM calls)
-        team.workflow.stream = Mock(return_value=iter([]))
+        team.workflow.stream = StubStream()
         
         events = list(team.run_stream("Test query"))
         
         # Should have at least a start event
         assert len(events) > 0
         assert events[0]["type"] == "start"
+        assert events[0]["time"].endswith("+00:00")
     
     def test_run_stream_handles_workflow_errors(self, mock_llm):
         """Test that run_stream handles workflow errors gracefully."""
         team = EnterpriseDataTeam(llm=mock_llm)
         
         # Mock the workflow to raise an exception
-        team.workflow.stream = Mock(side_effect=Exception("Workflow error"))
+        team.workflow.stream = StubStream(error=Exception("Workflow error"))
         
         events = list(team.run_stream("Test query"))
         
@@ -75,12 +89,12 @@ class TestEnterpriseDataTeam:
         
         # Create state with many messages
         state = create_initial_state("Test")
-        for i in range(10):
-            state["messages"].append(AIMessage(content=f"Message {i}"))
+        # model_construct skips pydantic validation; the content is known to be valid
+        state["messages"].extend(AIMessage.model_construct(content=f"Message {i}") for i in range(10))
         
         # Mock workflow to return state with many messages
         mock_step = {("supervisor",): {"messages": state["messages"]}}
-        team.workflow.stream = Mock(return_value=iter([mock_step]))
+        team.workflow.stream = StubStream([mock_step])
         
         events = list(team.run_stream("Test query"))
         
@@ -108,3 +122,174 @@ class TestEnterpriseDataTeam:
         # This is a complex test - just verify the method exists
         assert hasattr(team, "_supervisor_node")
 
+    
+    def test_analysis_flows_directly_to_strategist(self, mock_llm):
+        """Test that a completed analysis skips the supervisor hop to the strategist."""
+        team = EnterpriseDataTeam(llm=mock_llm)
+        team.analyst_agent.invoke = Mock(return_value=[AIMessage(content="ANALYSIS: Revenue up 10%")])
+        team.strategist_agent.invoke = Mock(return_value=[AIMessage(content='STRATEGY: {"actions": []}')])
+        team.supervisor.chain = MagicMock()
+        
+        events = list(team.run_stream("What is our revenue?"))
+        
+        steps = [e.get("agent") for e in events if e["type"] in ("decision", "action")]
+        assert steps == ["Supervisor", "Data_Analyst", "Business_Strategist", "Supervisor"]
+        assert events[-1]["type"] == "finish"
+        team.supervisor.chain.invoke.assert_not_called()
+    
+    def test_repeated_routing_without_output_finishes(self, default_team):
+        """Test that two routings to the same worker without its output stop the workflow."""
+        state = create_initial_state("Test")
+        state["routing_history"] = ["Data_Analyst", "Data_Analyst"]
+        
+        update = default_team._supervisor_node(state)
+        
+        assert update["next_agent"] == "FINISH"
+        assert "Data_Analyst" in update["reasoning"]
+    
+    def test_routing_history_is_capped(self, default_team):
+        """Test that the supervisor appends its decision to a bounded routing history."""
+        state = create_initial_state("Test")
+        state["routing_history"] = ["Data_Analyst", "Business_Strategist", "Data_Analyst"]
+        state["has_analysis"] = True
+        
+        update = default_team._supervisor_node(state)
+        
+        assert update["routing_history"] == ["Business_Strategist", "Data_Analyst", "Business_Strategist"]
+    
+    @pytest.mark.parametrize("deterministic, decide_calls", [(True, 0), (False, 1)],
+                             ids=["flags-route", "llm-routes"])
+    def test_deterministic_routing_skips_supervisor_llm(self, mock_llm, deterministic, decide_calls):
+        """Test that the completion flags route without the supervisor unless disabled."""
+        team = EnterpriseDataTeam(llm=mock_llm, deterministic_routing=deterministic)
+        team.supervisor.decide = Mock(return_value=("Business_Strategist", "Analysis done"))
+        state = create_initial_state("Test")
+        state["has_analysis"] = True
+        
+        update = team._supervisor_node(state)
+        
+        assert update["next_agent"] == "Business_Strategist"
+        assert team.supervisor.decide.call_count == decide_calls
+    
+    def test_legacy_routing_from_messages_finishes(self, default_team):
+        """Test that states without a routing history recover it from supervisor messages."""
+        state = create_initial_state("Test")
+        del state["routing_history"]
+        state["messages"] += [
+            AIMessage(content="[Supervisor] Routing to Data_Analyst. Reasoning: Need data"),
+            AIMessage(content="ERROR: Data_Analyst failed: timeout"),
+            AIMessage(content="[Supervisor] Routing to Data_Analyst. Reasoning: Retry"),
+        ]
+        
+        update = default_team._supervisor_node(state)
+        
+        assert update["next_agent"] == "FINISH"
+        assert "Data_Analyst" in update["reasoning"]
+    
+    def test_repeated_structured_routing_finishes(self, default_team):
+        """Test that the legacy loop guard reads the routing decision stored on supervisor messages."""
+        state = create_initial_state("Test")
+        del state["routing_history"]
+        state["messages"] += [
+            AIMessage(content="[Supervisor] Need data", additional_kwargs={"next_agent": "Data_Analyst"}),
+            AIMessage(content="ERROR: Data_Analyst failed: timeout"),
+            AIMessage(content="[Supervisor] Retry", additional_kwargs={"next_agent": "Data_Analyst"}),
+        ]
+        
+        update = default_team._supervisor_node(state)
+        
+        assert update["next_agent"] == "FINISH"
+        assert "Data_Analyst" in update["reasoning"]
+    
+    def test_graph_state_keeps_each_message_once(self, mock_llm):
+        """Test that nodes append only their new messages to the graph state."""
+        team = EnterpriseDataTeam(llm=mock_llm)
+        team.analyst_agent.invoke = Mock(return_value=[AIMessage(content="ANALYSIS: Revenue up 10%")])
+        team.strategist_agent.invoke = Mock(return_value=[AIMessage(content='STRATEGY: {"actions": []}')])
+        
+        final_state = team.workflow.invoke(create_initial_state("What is our revenue?"))
+        
+        contents = [msg.content for msg in final_state["messages"]]
+        assert contents[0] == "What is our revenue?"
+        assert contents[2:] == ["ANALYSIS: Revenue up 10%", 'STRATEGY: {"actions": []}']
+        assert len(contents) == 4
+        assert final_state["has_analysis"] and final_state["has_strategy"]
+    
+    @pytest.mark.parametrize("flags, finishes", [
+        ({"has_analysis": True, "has_strategy": True}, True),
+        ({}, False),
+    ], ids=["completion-flags", "legacy-state-scans-messages"])
+    def test_supervisor_reads_completion_flags(self, mock_llm, flags, finishes):
+        """Test that the supervisor finishes on the workers' flags, scanning messages only without them."""
+        state = create_initial_state("Test")
+        del state["has_analysis"], state["has_strategy"]
+        state.update(flags)
+        state["messages"].append(AIMessage(content="ANALYSIS: Revenue up 10%"))
+        team = EnterpriseDataTeam(llm=mock_llm)
+        team.supervisor.decide = Mock(return_value=("Business_Strategist", "Analysis done"))
+        
+        update = team._supervisor_node(state)
+        
+        assert (update["next_agent"] == "FINISH") is finishes
+    
+    def test_analyst_errors_return_to_supervisor(self, default_team):
+        """Test that a failed analysis is routed back through the supervisor."""
+        state = create_initial_state("Test")
+        state["last_error"] = "timeout"
+        
+        assert default_team._route_after_analyst(state) == "supervisor"
+    
+    def test_analyst_node_extracts_raw_data(self, mock_llm):
+        """Test that the DATA section of an analysis is stored as raw_data."""
+        team = EnterpriseDataTeam(llm=mock_llm)
+        team.analyst_agent.invoke = Mock(return_value=[
+            AIMessage(content='ANALYSIS: Margin 22.4% | DATA: {"labels":["Avg"],"values":[22.4],"type":"margin"}')
+        ])
+        
+        update = team._analyst_node(create_initial_state("What are our margins?"))
+        
+        assert update["raw_data"] == {"labels": ["Avg"], "values": [22.4], "type": "margin"}
+    
+    def test_analyst_node_extracts_nested_raw_data(self, mock_llm):
+        """Test that a DATA object with nested objects is decoded in full."""
+        team = EnterpriseDataTeam(llm=mock_llm)
+        team.analyst_agent.invoke = Mock(return_value=[
+            AIMessage(content='ANALYSIS: ROI | DATA: {"values": [1], "meta": {"best": {"dept": "Ops"}}} trailing }')
+        ])
+        
+        update = team._analyst_node(create_initial_state("What is our ROI?"))
+        
+        assert update["raw_data"] == {"values": [1], "meta": {"best": {"dept": "Ops"}}}
+    
+    def test_interrupted_run_resumes_from_checkpoint(self, mock_llm):
+        """Test that rerunning an interrupted thread skips the nodes it already completed."""
+        from langgraph.checkpoint.memory import InMemorySaver
+        
+        team = EnterpriseDataTeam(llm=mock_llm, checkpointer=InMemorySaver())
+        team.analyst_agent.invoke = Mock(return_value=[AIMessage(content="ANALYSIS: Revenue up 10%")])
+        team.strategist_agent.invoke = Mock(return_value=[AIMessage(content='STRATEGY: {"actions": []}')])
+        
+        # Stop consuming the stream right after the analysis (e.g. a dropped client)
+        stream = team.run_stream("What is our revenue?", thread_id="request-1")
+        for event in stream:
+            if event.get("agent") == "Data_Analyst":
+                break
+        stream.close()
+        
+        # Another request for the same query gets its own thread
+        list(team.run_stream("What is our revenue?"))
+        assert team.analyst_agent.invoke.call_count == 2
+        
+        events = list(team.run_stream("What is our revenue?", thread_id="request-1"))
+        
+        assert events[0]["thread_id"] == "request-1"
+        assert [e.get("agent") for e in events if e["type"] == "action"] == ["Business_Strategist"]
+        assert events[-1]["type"] == "finish"
+        assert team.analyst_agent.invoke.call_count == 2
+        
+        # Finished runs leave no checkpoints behind
+        assert not list(team.checkpointer.list(None))
+        
+        # A finished thread starts over on the next run
+        list(team.run_stream("What is our revenue?", thread_id="request-1"))
+        assert team.analyst_agent.invoke.call_count == 3
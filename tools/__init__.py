@@ -2,18 +2,23 @@
 Tools package for the Enterprise Data Analyst Agent.
 
 This package contains analysis tools and security utilities.
+The analysis tools depend on LangChain and an Excel reader, so they are imported on
+first access; importing only the security helpers stays lightweight.
 """
 
-from tools.analysis_tools import (
-    execute_python_analysis,
-    generate_chart_config,
-)
+from typing import TYPE_CHECKING
+
 from tools.security import (
     is_code_safe,
     validate_code_safety,
     SecurityViolationError,
 )
 
+if TYPE_CHECKING:
+    from tools.analysis_tools import execute_python_analysis, generate_chart_config
+
+_LAZY_TOOLS = ("execute_python_analysis", "generate_chart_config")
+
 __all__ = [
     "execute_python_analysis",
     "generate_chart_config",
@@ -22,3 +27,20 @@ __all__ = [
     "SecurityViolationError",
 ]
 
+
+def __getattr__(name: str):
+    """
+    Import the analysis tools on first access (PEP 562).
+
+    Args:
+        name: Attribute requested from the package
+
+    Returns:
+        The requested tool, cached in the package namespace afterwards
+    """
+    if name in _LAZY_TOOLS:
+        from tools import analysis_tools
+        value = getattr(analysis_tools, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,11 +7,15 @@ preventing unsafe operations and security vulnerabilities.
 
 import ast
 import logging
+import re
 from typing import Optional
 from config import FORBIDDEN_MODULES
 
 logger = logging.getLogger(__name__)
 
+# Any forbidden import or name in ASCII source shows up as one of these whole words
+_FORBIDDEN_WORD_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, sorted(FORBIDDEN_MODULES))) + r")\b")
+
 
 class SecurityViolationError(Exception):
     """Raised when code security validation fails."""
@@ -48,34 +52,42 @@ def is_code_safe(code: str) -> bool:
     try:
         tree = ast.parse(code)
     except SyntaxError as e:
-        logger.warning(f"Code syntax error: {e}")
+        logger.warning("Code syntax error: %s", e)
         return False
     except Exception as e:
-        logger.error(f"Unexpected error parsing code: {e}")
+        logger.error("Unexpected error parsing code: %s", e)
         return False
     
-    # Walk through AST nodes to find dangerous patterns
+    # Without a forbidden word the walk cannot find anything; non-ASCII source is always
+    # walked because the parser NFKC-normalizes identifiers (e.g. fullwidth "ｏｓ" -> os)
+    if code.isascii() and _FORBIDDEN_WORD_RE.search(code) is None:
+        return True
+    
+    # Bound locally: the membership test runs for every import and name node
+    forbidden = FORBIDDEN_MODULES
+    
+    # Walk through AST nodes to find dangerous patterns (a node matches at most one branch)
     for node in ast.walk(tree):
         # Check imports
         if isinstance(node, ast.Import):
             for alias in node.names:
                 module_name = alias.name.split(".")[0]
-                if module_name in FORBIDDEN_MODULES:
-                    logger.warning(f"Forbidden import detected: {module_name}")
+                if module_name in forbidden:
+                    logger.warning("Forbidden import detected: %s", module_name)
                     return False
         
         # Check import from statements
-        if isinstance(node, ast.ImportFrom):
+        elif isinstance(node, ast.ImportFrom):
             if node.module:
                 module_name = node.module.split(".")[0]
-                if module_name in FORBIDDEN_MODULES:
-                    logger.warning(f"Forbidden import from detected: {module_name}")
+                if module_name in forbidden:
+                    logger.warning("Forbidden import from detected: %s", module_name)
                     return False
         
         # Check for forbidden names in code
-        if isinstance(node, ast.Name):
-            if node.id in FORBIDDEN_MODULES:
-                logger.warning(f"Forbidden name detected: {node.id}")
+        elif isinstance(node, ast.Name):
+            if node.id in forbidden:
+                logger.warning("Forbidden name detected: %s", node.id)
                 return False
     
     return True
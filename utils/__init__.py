@@ -5,6 +5,7 @@ This package contains utility functions and helpers.
 """
 
 from utils.logging_config import setup_logging
+from utils.timestamps import utc_now_iso, utc_now_iso_seconds
 
-__all__ = ["setup_logging"]
+__all__ = ["setup_logging", "utc_now_iso", "utc_now_iso_seconds"]
 
@@ -6,8 +6,12 @@ This module sets up structured logging for the entire application.
 
 import logging
 import sys
+from typing import Optional
 from config import LOG_LEVEL
 
+# Console handler installed by setup_logging, kept so repeated calls don't add another
+_console_handler: Optional[logging.Handler] = None
+
 
 def setup_logging():
     """
@@ -17,7 +21,18 @@ def setup_logging():
     - Log level from configuration
     - Format with timestamps and log levels
     - Console handler for output
+    
+    Safe to call more than once (e.g. under a reloader or in tests); the
+    console handler is only attached the first time.
     """
+    global _console_handler
+    
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, LOG_LEVEL.upper(), logging.INFO))
+    
+    if _console_handler is not None and _console_handler in root_logger.handlers:
+        return root_logger
+    
     # Create formatter
     formatter = logging.Formatter(
         fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -28,10 +43,9 @@ def setup_logging():
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
     
-    # Configure root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, LOG_LEVEL.upper(), logging.INFO))
+    # Attach to the root logger
     root_logger.addHandler(console_handler)
+    _console_handler = console_handler
     
     # Set specific logger levels
     logging.getLogger("httpx").setLevel(logging.WARNING)
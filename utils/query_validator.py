@@ -7,11 +7,52 @@ them through the workflow, filtering out absurd or nonsensical queries.
 
 import re
 import logging
+from collections import Counter
+from functools import lru_cache
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Number of validation results memoized per function; retried queries are common in chat
+VALIDATION_CACHE_SIZE = 1024
 
+# Topics unrelated to business/data analysis (flagged only in very short queries)
+_UNRELATED_KEYWORDS = (
+    "recipe", "cooking", "how to cook", "ingredients",
+    "weather", "forecast", "temperature",
+    "joke", "funny", "meme", "lol",
+    "what is love", "meaning of life", "philosophy",
+    "random", "test", "asdf", "qwerty",
+    "hello world", "hi there", "just testing"
+)
+
+# Requests that are clearly not data analysis (e.g. "tell me a story", "sing a song")
+_ABSURD_PATTERNS = (
+    r"tell me (a|the) (story|joke|joke|tale)",
+    r"sing (me|a|the)",
+    r"what (color|animal|food) (do|does|is)",
+    r"draw|paint|sketch",
+    r"play (music|song|game)",
+)
+
+# Very vague queries that need more context
+_VAGUE_PATTERNS = (
+    r"^what('s| is) (our|the) (performance|status|situation)( like)?\??$",
+    r"^how (are|is) (we|things|it)( doing)?\??$",
+    r"^tell me (about|something) (our|the)",
+)
+
+# Each list is compiled once into a single alternation so a query is scanned in one pass
+_UNRELATED_RE = re.compile("|".join(re.escape(keyword) for keyword in _UNRELATED_KEYWORDS))
+_ABSURD_RE = re.compile("|".join(f"(?:{pattern})" for pattern in _ABSURD_PATTERNS))
+_VAGUE_RE = re.compile("|".join(f"(?:{pattern})" for pattern in _VAGUE_PATTERNS))
+_VAGUE_PREFIXES = ("what", "how", "tell me")
+
+# Every absurd pattern contains one of these substrings; queries without any skip the regex
+_ABSURD_TRIGGERS = ("tell me", "sing", "what", "draw", "paint", "sketch", "play")
+
+
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
 def is_query_absurd(query: str) -> tuple[bool, Optional[str]]:
     """
     Check if a query is absurd or nonsensical.
@@ -22,6 +63,8 @@ def is_query_absurd(query: str) -> tuple[bool, Optional[str]]:
     - Are clearly not business/data questions
     - Contain only random characters or symbols
     
+    Results are memoized per query string.
+    
     Args:
         query: User query string to validate
         
@@ -34,72 +77,45 @@ def is_query_absurd(query: str) -> tuple[bool, Optional[str]]:
         return True, "Query is empty"
     
     query_lower = query.lower().strip()
+    compact = query.replace(" ", "")
+    total_chars = len(compact)
     
     # Check for completely random character sequences
     # If query is mostly non-alphabetic characters, it's likely absurd
-    alpha_chars = sum(1 for c in query if c.isalpha())
-    total_chars = len(query.replace(" ", ""))
-    if total_chars > 10 and alpha_chars / total_chars < 0.3:
+    # (short queries skip the per-character scan entirely)
+    if total_chars > 10 and sum(map(str.isalpha, query)) / total_chars < 0.3:
         return True, "Query contains too many non-alphabetic characters"
     
     # Check for repeated single characters (e.g., "aaaaaa", "111111")
-    if len(query) > 5:
-        char_counts = {}
-        for char in query.replace(" ", ""):
-            char_counts[char] = char_counts.get(char, 0) + 1
-        max_repeat = max(char_counts.values()) if char_counts else 0
-        if max_repeat > len(query.replace(" ", "")) * 0.7:
+    if len(query) > 5 and compact:
+        max_repeat = max(Counter(compact).values())
+        if max_repeat > total_chars * 0.7:
             return True, "Query contains too many repeated characters"
     
-    # Check for completely unrelated topics (not business/data related)
-    unrelated_keywords = [
-        "recipe", "cooking", "how to cook", "ingredients",
-        "weather", "forecast", "temperature",
-        "joke", "funny", "meme", "lol",
-        "what is love", "meaning of life", "philosophy",
-        "random", "test", "asdf", "qwerty",
-        "hello world", "hi there", "just testing"
-    ]
-    
     # Only flag as absurd if query is very short AND contains unrelated keywords
     if len(query_lower.split()) <= 3:
-        for keyword in unrelated_keywords:
-            if keyword in query_lower:
-                return True, f"Query appears to be unrelated to data analysis: '{keyword}'"
+        match = _UNRELATED_RE.search(query_lower)
+        if match:
+            return True, f"Query appears to be unrelated to data analysis: '{match.group(0)}'"
     
-    # Check for gibberish (very short queries with no meaningful words)
-    if len(query_lower.split()) <= 2 and len(query_lower) < 10:
-        # Check if it looks like random typing
-        if not any(word in query_lower for word in [
-            "what", "how", "analyze", "calculate", "show", "find", "get",
-            "revenue", "sales", "profit", "margin", "data", "performance",
-            "trend", "growth", "quarter", "month", "year"
-        ]):
-            # Might be ambiguous but not necessarily absurd - let it through
-            pass
+    # Very short queries with no meaningful words might be ambiguous but are not
+    # necessarily absurd, so they are let through
     
     # Check for queries that are clearly not data analysis questions
-    # (e.g., "tell me a story", "sing a song", etc.)
-    absurd_patterns = [
-        r"tell me (a|the) (story|joke|joke|tale)",
-        r"sing (me|a|the)",
-        r"what (color|animal|food) (do|does|is)",
-        r"draw|paint|sketch",
-        r"play (music|song|game)",
-    ]
-    
-    for pattern in absurd_patterns:
-        if re.search(pattern, query_lower):
-            return True, f"Query is not a data analysis question"
+    if any(trigger in query_lower for trigger in _ABSURD_TRIGGERS) and _ABSURD_RE.search(query_lower):
+        return True, "Query is not a data analysis question"
     
     # Query seems reasonable
     return False, None
 
 
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
 def is_query_too_ambiguous(query: str) -> tuple[bool, Optional[str]]:
     """
     Check if a query is too ambiguous to provide meaningful analysis.
     
+    Results are memoized per query string.
+    
     Args:
         query: User query string to check
         
@@ -108,16 +124,12 @@ def is_query_too_ambiguous(query: str) -> tuple[bool, Optional[str]]:
     """
     query_lower = query.lower().strip()
     
-    # Very vague queries that need more context
-    vague_patterns = [
-        r"^what('s| is) (our|the) (performance|status|situation)( like)?\??$",
-        r"^how (are|is) (we|things|it)( doing)?\??$",
-        r"^tell me (about|something) (our|the)",
-    ]
+    # Every vague pattern is anchored at one of these openings
+    if not query_lower.startswith(_VAGUE_PREFIXES):
+        return False, None
     
-    for pattern in vague_patterns:
-        if re.match(pattern, query_lower):
-            return True, "Query is too vague. Please specify what metrics or data you want analyzed (e.g., 'What are our revenue trends?' or 'Analyze profit margins')."
+    if _VAGUE_RE.match(query_lower):
+        return True, "Query is too vague. Please specify what metrics or data you want analyzed (e.g., 'What are our revenue trends?' or 'Analyze profit margins')."
     
     return False, None
 
@@ -0,0 +1,40 @@
+"""
+Timestamp helpers for API responses and workflow events.
+
+This module provides cheap UTC ISO-8601 timestamps for hot paths such as
+health checks that are polled by load balancers.
+"""
+
+import time
+from datetime import datetime, timezone
+
+# (epoch second, formatted timestamp) of the last formatted value
+_second_cache: tuple[int, str] = (-1, "")
+
+
+def utc_now_iso() -> str:
+    """
+    Return the current UTC time as an ISO 8601 string.
+    
+    Returns:
+        Timezone-aware timestamp, e.g. "2024-01-01T12:00:00.123456+00:00"
+    """
+    return datetime.now(timezone.utc).isoformat()
+
+
+def utc_now_iso_seconds() -> str:
+    """
+    Return the current UTC time as an ISO 8601 string with second precision.
+    
+    The string is formatted at most once per second and reused in between.
+    
+    Returns:
+        Timezone-aware timestamp, e.g. "2024-01-01T12:00:00+00:00"
+    """
+    global _second_cache
+    now = int(time.time())
+    second, text = _second_cache
+    if second != now:
+        text = datetime.fromtimestamp(now, tz=timezone.utc).isoformat()
+        _second_cache = (now, text)
+    return text
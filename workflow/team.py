@@ -5,25 +5,183 @@ This module contains the EnterpriseDataTeam class that orchestrates the
 supervisor-worker pattern using LangGraph.
 """
 
+import json
 import logging
+import re
+import sqlite3
+import uuid
+from collections import deque
+from functools import lru_cache
 from typing import Generator, Optional
-from datetime import datetime
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import BaseMessage, AIMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, END
 
 from core.state import AgentState, create_initial_state, merge_partial_state
 from agents import DataAnalystAgent, BusinessStrategistAgent, SupervisorAgent
+from agents.chains import default_llm
+from utils.timestamps import utc_now_iso
 from config import (
     MAX_ITERATIONS_DEFAULT,
     MESSAGE_WINDOW,
     VALID_AGENTS,
     DEFAULT_MODEL,
     LLM_TEMPERATURE,
+    CHECKPOINT_DB_PATH,
 )
 
+# Try to import orjson (optional dependency for faster DATA parsing)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+# Try to import the SQLite checkpointer (optional dependency: langgraph-checkpoint-sqlite)
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    SQLITE_CHECKPOINT_AVAILABLE = True
+except ImportError:
+    SQLITE_CHECKPOINT_AVAILABLE = False
+    SqliteSaver = None
+
 logger = logging.getLogger(__name__)
 
+# Decodes the "DATA: {...}" object of an analysis; raw_decode stops at the end of the
+# object, so nested objects parse in one linear scan without a regex
+_JSON_DECODER = json.JSONDecoder()
+
+# Agent named in a "[Supervisor] Routing to <agent>. Reasoning: ..." message; only
+# needed for messages without the structured "next_agent" field (e.g. older checkpoints)
+_ROUTING_RE = re.compile(r'Routing to([^.]*)')
+
+# Number of supervisor routing decisions kept in state for the loop guard
+_ROUTING_HISTORY_SIZE = 3
+
+# Fixed reasoning for the supervisor node's deterministic FINISH decisions
+_REASON_MAX_ITERATIONS = "Maximum iterations reached. Terminating workflow."
+_REASON_COMPLETED = "Analysis and strategy tasks completed successfully."
+_REASON_STRATEGY_EXISTS = "Strategy already completed. Task is finished."
+
+# Reasoning for routing decisions made from the completion flags
+_REASON_NEED_ANALYSIS = "No analysis yet. Routing to Data_Analyst to analyze the data."
+_REASON_NEED_STRATEGY = "Data analysis is complete. Routing for strategic recommendations."
+
+
+@lru_cache(maxsize=1)
+def _sqlite_checkpointer() -> "SqliteSaver":
+    """
+    Return the process-wide SqliteSaver on CHECKPOINT_DB_PATH.
+    
+    Every team shares one saver and its single connection, so pooled teams
+    neither open a connection each nor leave one behind when they are dropped.
+    
+    Returns:
+        Shared SqliteSaver instance
+    """
+    return SqliteSaver(sqlite3.connect(CHECKPOINT_DB_PATH, check_same_thread=False))
+
+
+def _output_markers(messages) -> tuple[bool, bool]:
+    """
+    Scan messages for the workers' "ANALYSIS:" and "STRATEGY:" output markers.
+    
+    Only used for states without the has_analysis/has_strategy flags (e.g. states
+    restored from checkpoints written before the flags existed).
+    
+    Args:
+        messages: Messages to scan
+        
+    Returns:
+        Tuple of (has_analysis, has_strategy)
+    """
+    has_analysis = False
+    has_strategy = False
+    for msg in messages:
+        content = getattr(msg, "content", None)
+        if not isinstance(content, str):
+            continue
+        if "ANALYSIS:" in content:
+            has_analysis = True
+        if "STRATEGY:" in content:
+            has_strategy = True
+    return has_analysis, has_strategy
+
+
+def _decode_data_object(payload: str):
+    """
+    Decode the JSON object at the start of a "DATA:" payload.
+    
+    The tool output ends with its DATA object, so the whole payload usually
+    parses with orjson when it is installed; text after the object falls back
+    to raw_decode, which stops at the end of the object.
+    
+    Args:
+        payload: Text starting with the DATA object's opening brace
+        
+    Returns:
+        The decoded object
+        
+    Raises:
+        json.JSONDecodeError: If the payload does not start with a valid JSON value
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            pass
+    value, _ = _JSON_DECODER.raw_decode(payload)
+    return value
+
+
+def _as_message_list(result) -> list[BaseMessage]:
+    """
+    Normalize a worker agent's result to a list of messages.
+    
+    WorkerAgent.invoke already returns a list, so that case is checked first;
+    other results are wrapped.
+    
+    Args:
+        result: Value returned by a worker agent's invoke
+        
+    Returns:
+        The result itself if it is a list, otherwise a one-message list
+    """
+    if isinstance(result, list):
+        return result
+    if isinstance(result, BaseMessage):
+        return [result]
+    return [AIMessage(content=str(result))]
+
+
+def _message_routings(messages) -> list[str]:
+    """
+    Recover the supervisor's routing decisions from its messages.
+    
+    Only used for states without a routing_history (e.g. states restored from
+    checkpoints written before it existed).
+    
+    Args:
+        messages: Messages to scan
+        
+    Returns:
+        Agents routed to by the last few supervisor messages, oldest first
+    """
+    routings = []
+    for msg in messages:
+        content = getattr(msg, "content", None)
+        if not isinstance(content, str) or "[Supervisor]" not in content:
+            continue
+        # Supervisor messages carry their routing decision as structured data
+        routed = msg.additional_kwargs.get("next_agent")
+        if routed is None:
+            routing = _ROUTING_RE.search(content)
+            routed = routing.group(1).strip() if routing else None
+        routings.append(routed)
+    return [routed for routed in routings[-_ROUTING_HISTORY_SIZE:] if routed]
+
 
 class EnterpriseDataTeam:
     """
@@ -41,7 +199,9 @@ class EnterpriseDataTeam:
         self,
         max_iterations: int = MAX_ITERATIONS_DEFAULT,
         message_window: int = MESSAGE_WINDOW,
-        llm: Optional[ChatOpenAI] = None
+        llm: Optional[ChatOpenAI] = None,
+        checkpointer: Optional[BaseCheckpointSaver] = None,
+        deterministic_routing: bool = True
     ):
         """
         Initialize the multi-agent team.
@@ -50,17 +210,19 @@ class EnterpriseDataTeam:
             max_iterations: Maximum number of workflow iterations before forcing termination
             message_window: Number of messages to keep in conversation history
             llm: Optional shared LLM instance (creates new one if not provided)
+            checkpointer: Optional LangGraph checkpointer; defaults to the shared
+                SqliteSaver on CHECKPOINT_DB_PATH when that is set, otherwise no checkpointing
+            deterministic_routing: Route from the workers' completion flags without
+                calling the supervisor LLM (False always asks the supervisor)
         """
         self.max_iterations = max_iterations
         self.message_window = message_window
+        self.deterministic_routing = deterministic_routing
         
         # Initialize shared LLM if not provided
         # Using a shared LLM instance ensures consistent behavior and reduces initialization overhead
         if llm is None:
-            self.llm = ChatOpenAI(
-                model=DEFAULT_MODEL,
-                temperature=LLM_TEMPERATURE
-            )
+            self.llm = default_llm(DEFAULT_MODEL, LLM_TEMPERATURE)
         else:
             self.llm = llm
         
@@ -70,6 +232,14 @@ class EnterpriseDataTeam:
         self.analyst_agent = DataAnalystAgent(llm=self.llm)
         self.strategist_agent = BusinessStrategistAgent(llm=self.llm)
         
+        # Checkpoint every step so a rerun of an interrupted query skips completed nodes
+        if checkpointer is None and CHECKPOINT_DB_PATH:
+            if SQLITE_CHECKPOINT_AVAILABLE:
+                checkpointer = _sqlite_checkpointer()
+            else:
+                logger.warning("CHECKPOINT_DB_PATH is set but langgraph-checkpoint-sqlite is not installed")
+        self.checkpointer = checkpointer
+        
         # Build and compile the workflow graph
         # The graph defines the flow: supervisor -> workers -> supervisor -> (finish or continue)
         self.workflow = self._build_graph()
@@ -82,6 +252,8 @@ class EnterpriseDataTeam:
         - Entry point: supervisor
         - Nodes: supervisor, Data_Analyst, Business_Strategist
         - Edges: Workers return to supervisor, supervisor routes conditionally
+        - Fast path: a fresh analysis goes straight to Business_Strategist,
+          skipping the supervisor round-trip the routing rules make redundant
         
         Returns:
             Compiled LangGraph workflow
@@ -96,8 +268,15 @@ class EnterpriseDataTeam:
         # Set entry point
         graph.set_entry_point("supervisor")
         
-        # Workers always return to supervisor
-        graph.add_edge("Data_Analyst", "supervisor")
+        # Analysis chains directly into strategy; otherwise workers return to supervisor
+        graph.add_conditional_edges(
+            "Data_Analyst",
+            self._route_after_analyst,
+            {
+                "Business_Strategist": "Business_Strategist",
+                "supervisor": "supervisor",
+            }
+        )
         graph.add_edge("Business_Strategist", "supervisor")
         
         # Supervisor routes conditionally based on next_agent
@@ -111,7 +290,34 @@ class EnterpriseDataTeam:
             }
         )
         
-        return graph.compile()
+        return graph.compile(checkpointer=self.checkpointer)
+    
+    def _route_after_analyst(self, state: AgentState) -> str:
+        """
+        Decide where to go after the Data_Analyst node.
+        
+        When an "ANALYSIS:" result is present and no strategy
+        exists yet, the supervisor would always route to Business_Strategist, so
+        the workflow goes there directly. Errors, missing analysis, existing
+        strategy or an exhausted iteration budget fall back to the supervisor.
+        
+        Args:
+            state: Workflow state after the analyst update
+            
+        Returns:
+            Name of the next node
+        """
+        if state.get("last_error") or state["iteration_count"] >= self.max_iterations:
+            return "supervisor"
+        
+        has_analysis = state.get("has_analysis")
+        has_strategy = state.get("has_strategy")
+        if has_analysis is None or has_strategy is None:
+            has_analysis, has_strategy = _output_markers(state["messages"])
+        
+        if has_strategy:
+            return "supervisor"
+        return "Business_Strategist" if has_analysis else "supervisor"
     
     def _analyst_node(self, state: AgentState) -> dict:
         """
@@ -133,41 +339,48 @@ class EnterpriseDataTeam:
             result_messages = self.analyst_agent.invoke(state)
             
             # Ensure we have a list
-            if not isinstance(result_messages, list):
-                result_messages = [result_messages] if isinstance(result_messages, BaseMessage) else [AIMessage(content=str(result_messages))]
+            result_messages = _as_message_list(result_messages)
             
             # Extract structured data from analysis results for Business_Strategist
             raw_data = None
-            import json
-            import re
+            has_analysis = False
             
             # Look for "DATA: {...}" in the result messages
             for msg in result_messages:
-                if hasattr(msg, 'content'):
-                    content = msg.content
-                    # Try to extract structured data from "DATA: {...}" section
-                    data_match = re.search(r'DATA:\s*(\{.*?\})', content, re.DOTALL)
-                    if data_match:
-                        try:
-                            raw_data = json.loads(data_match.group(1))
-                            logger.info(f"Extracted raw_data from analysis: {raw_data}")
-                            break
-                        except json.JSONDecodeError:
-                            pass
+                # One attribute read per message; non-text content cannot hold a DATA section
+                content = getattr(msg, "content", None)
+                if not isinstance(content, str):
+                    continue
+                if "ANALYSIS:" in content:
+                    has_analysis = True
+                # Try to extract structured data from "DATA: {...}" section
+                data_start = content.find("DATA:")
+                if data_start == -1:
+                    continue
+                payload = content[data_start + len("DATA:"):].lstrip()
+                if payload.startswith("{"):
+                    try:
+                        raw_data = _decode_data_object(payload)
+                        logger.info("Extracted raw_data from analysis: %s", raw_data)
+                        break
+                    except json.JSONDecodeError:
+                        pass
             
             return {
-                "messages": state["messages"] + result_messages,
+                "messages": result_messages,
                 "iteration_count": state["iteration_count"] + 1,
                 "next_agent": None,
                 "last_error": None,
                 "raw_data": raw_data,  # Store structured data for Business_Strategist
+                # Completion flag read by the supervisor instead of rescanning messages
+                "has_analysis": state.get("has_analysis", False) or has_analysis or raw_data is not None,
             }
             
         except Exception as e:
             logger.exception("Data_Analyst node failed")
             error_msg = AIMessage(content=f"ERROR: Data_Analyst failed: {str(e)}")
             return {
-                "messages": state["messages"] + [error_msg],
+                "messages": [error_msg],
                 "iteration_count": state["iteration_count"] + 1,
                 "next_agent": None,
                 "last_error": str(e),
@@ -189,26 +402,46 @@ class EnterpriseDataTeam:
             result_messages = self.strategist_agent.invoke(state)
             
             # Ensure we have a list
-            if not isinstance(result_messages, list):
-                result_messages = [result_messages] if isinstance(result_messages, BaseMessage) else [AIMessage(content=str(result_messages))]
+            result_messages = _as_message_list(result_messages)
+            
+            has_strategy = any(
+                isinstance(content, str) and "STRATEGY:" in content
+                for content in (getattr(msg, "content", None) for msg in result_messages)
+            )
             
             return {
-                "messages": state["messages"] + result_messages,
+                "messages": result_messages,
                 "iteration_count": state["iteration_count"] + 1,
                 "next_agent": None,
                 "last_error": None,
+                # Completion flag read by the supervisor instead of rescanning messages
+                "has_strategy": state.get("has_strategy", False) or has_strategy,
             }
             
         except Exception as e:
             logger.exception("Business_Strategist node failed")
             error_msg = AIMessage(content=f"ERROR: Business_Strategist failed: {str(e)}")
             return {
-                "messages": state["messages"] + [error_msg],
+                "messages": [error_msg],
                 "iteration_count": state["iteration_count"] + 1,
                 "next_agent": None,
                 "last_error": str(e),
             }
     
+    @staticmethod
+    def _finish(reasoning: str, error: Optional[str] = None) -> dict:
+        """
+        Build the supervisor node's partial state update for ending the workflow.
+        
+        Args:
+            reasoning: Why the workflow is finishing
+            error: Error to record, or None to clear any previous error
+            
+        Returns:
+            Partial state update routing to FINISH
+        """
+        return {"next_agent": "FINISH", "reasoning": reasoning, "last_error": error}
+    
     def _supervisor_node(self, state: AgentState) -> dict:
         """
         Execute the supervisor routing node.
@@ -217,7 +450,7 @@ class EnterpriseDataTeam:
         1. Checks iteration limits
         2. Detects completion conditions (analysis + strategy done)
         3. Detects infinite loops (same agent called repeatedly)
-        4. Calls supervisor to make routing decision
+        4. Routes deterministically from the completion flags, or calls the supervisor
         5. Validates the decision
         6. Updates state with routing information
         
@@ -229,109 +462,86 @@ class EnterpriseDataTeam:
         """
         # Enforce hard iteration limit
         if state["iteration_count"] >= self.max_iterations:
-            logger.warning(f"Max iterations ({self.max_iterations}) reached")
-            return {
-                "next_agent": "FINISH",
-                "reasoning": "Maximum iterations reached. Terminating workflow.",
-                "last_error": "Max iterations reached",
-            }
+            logger.warning("Max iterations (%d) reached", self.max_iterations)
+            return self._finish(_REASON_MAX_ITERATIONS, "Max iterations reached")
         
-        # Check for completion conditions by examining recent messages
-        recent_messages = state["messages"][-5:] if len(state["messages"]) > 5 else state["messages"]
-        message_contents = " ".join([msg.content for msg in recent_messages if hasattr(msg, 'content')])
+        # Check for completion conditions using the flags set by the worker nodes
+        recent_messages = state["messages"][-5:]
+        has_analysis = state.get("has_analysis")
+        has_strategy = state.get("has_strategy")
+        if has_analysis is None or has_strategy is None:
+            has_analysis, has_strategy = _output_markers(recent_messages)
         
-        # Check if both analysis and strategy are complete
-        has_analysis = "ANALYSIS:" in message_contents
-        has_strategy = "STRATEGY:" in message_contents
+        # Recent routing decisions for the loop guard, kept in state by this node
+        last_routings = state.get("routing_history")
+        if last_routings is None:
+            last_routings = _message_routings(recent_messages)
         
         if has_analysis and has_strategy:
             logger.info("Both analysis and strategy complete. Terminating workflow.")
-            return {
-                "next_agent": "FINISH",
-                "reasoning": "Analysis and strategy tasks completed successfully.",
-                "last_error": None,
-            }
+            return self._finish(_REASON_COMPLETED)
         
         # Detect repetitive routing - check if same agent was called AND didn't produce useful output
-        # Only terminate if agent was called multiple times AND didn't complete its task
-        supervisor_messages = [msg.content for msg in recent_messages 
-                              if hasattr(msg, 'content') and "[Supervisor]" in msg.content]
-        if len(supervisor_messages) >= 2:
-            # Extract agent names from supervisor messages
-            last_routings = []
-            for msg in supervisor_messages[-3:]:  # Check last 3 supervisor decisions
-                if "Routing to" in msg:
-                    agent_name = msg.split("Routing to")[1].split(".")[0].strip()
-                    last_routings.append(agent_name)
-            
-            # If same agent routed 2+ times in a row, check if it actually completed its task
-            if len(last_routings) >= 2 and len(set(last_routings[-2:])) == 1:
-                repeated_agent = last_routings[-1]
-                if repeated_agent != "FINISH":
-                    # Check if the agent actually produced useful output
-                    agent_completed = False
-                    if repeated_agent == "Data_Analyst":
-                        # Check if we have ANALYSIS: in messages
-                        agent_completed = "ANALYSIS:" in message_contents
-                    elif repeated_agent == "Business_Strategist":
-                        # Check if we have STRATEGY: in messages
-                        agent_completed = "STRATEGY:" in message_contents
-                    
-                    # Only terminate if agent was called multiple times AND didn't complete
-                    if not agent_completed:
-                        logger.warning(f"Detected repetitive routing to {repeated_agent} without completion. Terminating to prevent loop.")
-                        return {
-                            "next_agent": "FINISH",
-                            "reasoning": f"Prevented infinite loop: {repeated_agent} was called multiple times without completing its task.",
-                            "last_error": None,
-                        }
-                    else:
-                        # Agent completed, allow supervisor to decide next step
-                        logger.info(f"{repeated_agent} completed its task, allowing supervisor to decide next step.")
+        # Only terminate if the same agent was routed 2+ times in a row AND didn't complete its task
+        if len(last_routings) >= 2 and last_routings[-1] == last_routings[-2]:
+            repeated_agent = last_routings[-1]
+            if repeated_agent != "FINISH":
+                # Check if the agent actually produced useful output
+                agent_completed = False
+                if repeated_agent == "Data_Analyst":
+                    # Check if an ANALYSIS: result was produced
+                    agent_completed = has_analysis
+                elif repeated_agent == "Business_Strategist":
+                    # Check if a STRATEGY: result was produced
+                    agent_completed = has_strategy
+                
+                # Only terminate if agent was called multiple times AND didn't complete
+                if not agent_completed:
+                    logger.warning("Detected repetitive routing to %s without completion. Terminating to prevent loop.", repeated_agent)
+                    return self._finish(f"Prevented infinite loop: {repeated_agent} was called multiple times without completing its task.")
+                else:
+                    # Agent completed, allow supervisor to decide next step
+                    logger.info("%s completed its task, allowing supervisor to decide next step.", repeated_agent)
         
-        # Get routing decision from supervisor
+        # Get routing decision: without an analysis the next step is always the analyst,
+        # and with one (but no strategy) it is the strategist, so no LLM call is needed
         try:
-            next_agent, reasoning = self.supervisor.decide(state)
+            if self.deterministic_routing and not has_analysis:
+                next_agent, reasoning = "Data_Analyst", _REASON_NEED_ANALYSIS
+            elif self.deterministic_routing and not has_strategy:
+                next_agent, reasoning = "Business_Strategist", _REASON_NEED_STRATEGY
+            else:
+                next_agent, reasoning = self.supervisor.decide(state)
         except Exception as e:
             logger.exception("Supervisor decision failed")
-            return {
-                "next_agent": "FINISH",
-                "reasoning": f"Supervisor error: {str(e)}",
-                "last_error": f"Supervisor failure: {str(e)}",
-            }
+            return self._finish(f"Supervisor error: {str(e)}", f"Supervisor failure: {str(e)}")
         
         # Validate routing decision
         if next_agent not in VALID_AGENTS:
-            logger.warning(f"Invalid agent from supervisor: {next_agent}")
-            return {
-                "next_agent": "FINISH",
-                "reasoning": f"Invalid routing '{next_agent}'. Forcing termination.",
-                "last_error": f"Invalid routing: {next_agent}",
-            }
+            logger.warning("Invalid agent from supervisor: %s", next_agent)
+            return self._finish(f"Invalid routing '{next_agent}'. Forcing termination.", f"Invalid routing: {next_agent}")
         
         # Additional safety: if supervisor wants to route to same agent again
         # and we already have that agent's output, force finish
         if next_agent == "Business_Strategist" and has_strategy:
             logger.info("Strategy already exists. Preventing duplicate strategy generation.")
-            return {
-                "next_agent": "FINISH",
-                "reasoning": "Strategy already completed. Task is finished.",
-                "last_error": None,
-            }
+            return self._finish(_REASON_STRATEGY_EXISTS)
         
         # Create supervisor message for transparency
         supervisor_msg = AIMessage(
-            content=f"[Supervisor] Routing to {next_agent}. Reasoning: {reasoning}"
+            content=f"[Supervisor] Routing to {next_agent}. Reasoning: {reasoning}",
+            additional_kwargs={"next_agent": next_agent},
         )
         
         return {
             "next_agent": next_agent,
             "reasoning": reasoning,
-            "messages": state["messages"] + [supervisor_msg],
+            "messages": [supervisor_msg],
             "last_error": None,
+            "routing_history": [*last_routings, next_agent][-_ROUTING_HISTORY_SIZE:],
         }
     
-    def run_stream(self, query: str) -> Generator[dict, None, None]:
+    def run_stream(self, query: str, thread_id: Optional[str] = None) -> Generator[dict, None, None]:
         """
         Execute the workflow and stream events as they occur.
         
@@ -343,42 +553,68 @@ class EnterpriseDataTeam:
         - finish: Workflow completion
         - error: Error events
         
+        With a checkpointer, each run is checkpointed on its own thread, named in
+        the start event. Passing the thread_id of a run that stopped before
+        finishing resumes it from its last checkpoint instead of starting over; a
+        thread must not be used by two runs at the same time. The checkpoints of
+        a run that finishes are deleted.
+        
         Args:
             query: Initial user query to process
+            thread_id: Checkpoint thread to run on (only used with a checkpointer);
+                a new thread is used for every run when not given
             
         Yields:
             Dictionary events with type, timestamp, and relevant data
         """
         # Initialize state
-        state = create_initial_state(query)
+        initial_state = create_initial_state(query)
+        graph_input = initial_state
+        config = None
+        
+        if self.checkpointer is not None:
+            if thread_id is None:
+                # A fresh thread per request, so concurrent runs never share state
+                thread_id = uuid.uuid4().hex
+            config = {"configurable": {"thread_id": thread_id}}
+            snapshot = self.workflow.get_state(config)
+            if snapshot.next:
+                # Interrupted run: continue from the checkpointed state
+                logger.info("Resuming workflow thread %s at %s", thread_id, snapshot.next)
+                initial_state = snapshot.values
+                graph_input = None
+            elif snapshot.values:
+                # Finished run: start over rather than appending to its state
+                self.checkpointer.delete_thread(thread_id)
+        
+        # Apply message windowing to prevent token overflow: the streamed copy of the
+        # state keeps only the most recent N messages in a bounded deque, which drops
+        # the oldest ones as new messages arrive (the graph itself keeps full history)
+        state = {**initial_state, "messages": deque(initial_state["messages"], maxlen=self.message_window)}
         
         # Yield start event
-        yield {
+        start_event = {
             "type": "start",
-            "time": datetime.utcnow().isoformat(),
+            "time": utc_now_iso(),
             "data": f"Workflow started: {query}",
         }
+        if config is not None:
+            start_event["thread_id"] = thread_id
+        yield start_event
         
         try:
             # Stream workflow execution
-            for step in self.workflow.stream(state):
+            for step in self.workflow.stream(graph_input, config=config):
                 # Step is a dict: {node_name: partial_state}
                 for node_name, partial in step.items():
-                    # Merge partial state update
+                    # Merge partial state update (new messages go into the window)
                     state = merge_partial_state(state, partial)
                     
-                    # Apply message windowing to prevent token overflow
-                    # This keeps only the most recent N messages, discarding older context
-                    # This is critical for long-running conversations to stay within token limits
-                    if len(state["messages"]) > self.message_window:
-                        # Keep only the most recent messages (sliding window approach)
-                        state["messages"] = state["messages"][-self.message_window:]
-                    
                     # Yield appropriate event based on node
                     if node_name == "supervisor":
                         yield {
                             "type": "decision",
-                            "time": datetime.utcnow().isoformat(),
+                            "time": utc_now_iso(),
                             "agent": "Supervisor",
                             "decision": state.get("next_agent"),
                             "reasoning": state.get("reasoning"),
@@ -394,17 +630,21 @@ class EnterpriseDataTeam:
                         )
                         yield {
                             "type": "action",
-                            "time": datetime.utcnow().isoformat(),
+                            "time": utc_now_iso(),
                             "agent": node_name,
                             "output": last_msg,
                             "iteration_count": state["iteration_count"],
                             "last_error": state.get("last_error"),
                         }
             
+            # A finished run is never resumed, so its checkpoints are dropped
+            if config is not None:
+                self.checkpointer.delete_thread(thread_id)
+            
             # Yield completion event
             yield {
                 "type": "finish",
-                "time": datetime.utcnow().isoformat(),
+                "time": utc_now_iso(),
                 "data": "Workflow completed successfully",
                 "final_iteration_count": state["iteration_count"],
             }
@@ -413,7 +653,7 @@ class EnterpriseDataTeam:
             logger.exception("Unexpected error during workflow streaming")
             yield {
                 "type": "error",
-                "time": datetime.utcnow().isoformat(),
+                "time": utc_now_iso(),
                 "error": f"Workflow runtime error: {str(e)}",
             }
 